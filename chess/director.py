@@ -82,3 +82,5 @@ class Director:
                 fps = self.clock.get_fps()
                 with_fps = "{} - {:.2f} FPS".format(self.caption, fps)
                 pg.display.set_caption(with_fps)
+        for state in self.state_dict.values():
+            state.shutdown()
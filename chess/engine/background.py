@@ -0,0 +1,126 @@
+""" Engine players thinking in a process of their own, so whoever waits on
+them (the pygame window) keeps the interpreter to itself.
+
+The player is built once in the worker process and stays there between
+moves, so transposition tables and search trees carry over from one move
+to the next like they do in process. choose hands back a future whose
+result is the move and the player's report on it.
+"""
+import time
+import logging
+import threading
+import multiprocessing as mp
+from pathlib import Path
+from concurrent.futures import Future, ProcessPoolExecutor
+
+from chess.engine.position import position_state, position_from_state
+
+
+logger = logging.getLogger(Path(__file__).stem)
+
+# the worker process' player
+_player = None
+
+
+def _watch(stop_event):
+    """ Stops the player whenever the parent sets stop_event """
+    while True:
+        stop_event.wait()
+        _player.stop()
+        # wait for the next choose to clear it
+        while stop_event.is_set():
+            time.sleep(0.05)
+
+
+def _start(engine, args, kwargs, stop_event):
+    global _player
+    _player = engine(*args, **kwargs)
+    threading.Thread(target=_watch, args=(stop_event,), daemon=True).start()
+
+
+def _choose(state):
+    move = _player.choose(position_from_state(state))
+    return move, _player.report()
+
+
+def _ponder(state):
+    _player.ponder(position_from_state(state))
+
+
+def _close():
+    _player.close()
+
+
+class BackgroundPlayer:
+    """ An engine player, built out of engine(*args, **kwargs) in a worker
+    process. Close it to stop the process """
+
+    def __init__(self, engine, *args, **kwargs):
+        self.name = engine.name
+        # spawned clean instead of forked out of a process running pygame
+        context = mp.get_context('spawn')
+        self.stop_event = context.Event()
+        self.executor = ProcessPoolExecutor(
+            max_workers=1, mp_context=context,
+            initializer=_start, initargs=(engine, args, kwargs, self.stop_event)
+        )
+        # the process starts with the first move
+        self.started = False
+        # submitted and maybe not done, to cancel on close
+        self.futures = []
+
+    def choose(self, position) -> Future:
+        """ Future of (packed move, report) for the side to move """
+        self.stop_event.clear()
+        self.started = True
+        return self.submit(_choose, position_state(position))
+
+    def ponder(self, position):
+        """ Lets the player think on the rival's time, position being the
+        one after its own move. Returns straight away """
+        self.submit(_ponder, position_state(position))
+
+    def submit(self, fn, *args):
+        self.futures = [future for future in self.futures if not future.done()]
+        future = self.executor.submit(fn, *args)
+        self.futures.append(future)
+        return future
+
+    def stop(self):
+        """ Makes the move being chosen come back early """
+        self.stop_event.set()
+
+    def close(self):
+        self.stop()
+        # shutdown's cancel_futures is python 3.9 and up
+        for future in self.futures:
+            future.cancel()
+        if self.started:
+            try:
+                self.executor.submit(_close).result(timeout=10)
+            except Exception:
+                logger.exception('Closing the %s worker', self.name)
+        self.executor.shutdown(wait=True)
+
+
+class InlinePlayer:
+    """ Stands in for BackgroundPlayer with players quick enough to choose
+    in the caller's process, e.g. random ones. Its futures come back done """
+
+    def __init__(self, engine, *args, **kwargs):
+        self.name = engine.name
+        self.player = engine(*args, **kwargs)
+
+    def choose(self, position) -> Future:
+        future = Future()
+        future.set_result((self.player.choose(position), self.player.report()))
+        return future
+
+    def ponder(self, position):
+        self.player.ponder(position)
+
+    def stop(self):
+        self.player.stop()
+
+    def close(self):
+        self.player.close()
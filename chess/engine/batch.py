@@ -0,0 +1,104 @@
+""" Vectorized evaluation of many grids at once, for analysis and datasets.
+
+Grids are stacked into an (N, 8, 8) array in the board's encoding (num *
+100 + color * 10 + type) and turned into (N, 12, 64) boolean piece planes,
+one per piece code in PIECE_CODES order. Material and piece-square terms
+are a dot product of the planes with the tables of
+chess.engine.evaluation, so without mobility the scores are exactly the
+ones evaluate() gives, seen from white's side.
+"""
+import numpy as np
+
+from chess.engine.encoding import (
+    WHITE, COLORS, ROOK, KNIGHT, BISHOP, QUEEN, PIECE_CODES, COLOR_OF
+)
+from chess.engine.evaluation import MIDDLEGAME, ENDGAME, PHASE, MAX_PHASE
+from chess.engine.tables import STEPS, STRAIGHTS, DIAGONALS, KNIGHT_SQUARES
+
+
+# centipawns per square a piece can move to
+MOBILITY_WEIGHTS = {KNIGHT: 4, BISHOP: 5, ROOK: 2, QUEEN: 1}
+
+# tables of every piece code, stacked in plane order
+MIDDLEGAME_PLANES = np.array([MIDDLEGAME[code] for code in PIECE_CODES], dtype=np.int64)
+ENDGAME_PLANES = np.array([ENDGAME[code] for code in PIECE_CODES], dtype=np.int64)
+PHASE_PLANES = np.array([PHASE[code] for code in PIECE_CODES], dtype=np.int64)
+PLANE_OF = {code: i for i, code in enumerate(PIECE_CODES)}
+
+
+def _knight_matrix():
+    """ matrix[a, b] is 1 when a knight on a attacks b """
+    matrix = np.zeros((64, 64), dtype=np.int64)
+    for sq, targets in enumerate(KNIGHT_SQUARES):
+        matrix[sq, list(targets)] = 1
+    return matrix
+
+
+KNIGHT_MATRIX = _knight_matrix()
+
+
+def stack_grids(grids):
+    """ (N, 64) piece codes out of a grid, a list of grids or an (N, 8, 8)
+    array of them """
+    return np.asarray(grids, dtype=np.int64).reshape(-1, 64) % 100
+
+
+def piece_planes(grids):
+    """ (N, 12, 64) boolean planes, one per piece code """
+    codes = stack_grids(grids)
+    return codes[:, None, :] == np.array(PIECE_CODES)[None, :, None]
+
+
+def _shift(boards, dr, dc):
+    """ (N, 8, 8) boards moved dr rows and dc columns, squares falling off
+    the edge lost and the ones left behind emptied """
+    shifted = np.zeros_like(boards)
+    shifted[:, max(dr, 0):8 + min(dr, 0), max(dc, 0):8 + min(dc, 0)] = \
+        boards[:, max(-dr, 0):8 + min(-dr, 0), max(-dc, 0):8 + min(-dc, 0)]
+    return shifted
+
+
+def mobility(planes):
+    """ Weighted count of the squares knights and sliders can move to,
+    white's minus black's """
+    n = planes.shape[0]
+    boards = planes.reshape(n, 12, 8, 8)
+    occupied = boards.any(axis=1)
+    score = np.zeros(n, dtype=np.int64)
+    for color in COLORS:
+        own = [PLANE_OF[code] for code in PIECE_CODES if COLOR_OF[code] == color]
+        free = ~boards[:, own].any(axis=1)
+        weighted = {
+            type: boards[:, PLANE_OF[color * 10 + type]].astype(np.int16) * weight
+            for type, weight in MOBILITY_WEIGHTS.items()
+        }
+        # weighted number of pieces reaching every square
+        reach = (weighted[KNIGHT].reshape(n, 64) @ KNIGHT_MATRIX).reshape(n, 8, 8)
+        # sliders sharing a direction walk it together, weight and all:
+        # their rays can't overlap as the one behind stops at the other
+        for directions, sliders in ((DIAGONALS, weighted[BISHOP]), (STRAIGHTS, weighted[ROOK])):
+            sliders = sliders + weighted[QUEEN]
+            for direction in directions:
+                dr, dc = STEPS[direction]
+                front = sliders
+                for _ in range(7):
+                    front = _shift(front, dr, dc)
+                    reach += front
+                    # rays stop at the first piece they meet
+                    front = front * ~occupied
+        moves = (reach * free).sum(axis=(1, 2))
+        score += moves if color == WHITE else -moves
+    return score
+
+
+def evaluate_grids(grids, with_mobility=True):
+    """ Score vector of a batch of grids, in centipawns from white's side """
+    planes = piece_planes(grids)
+    counts = planes.astype(np.int64)
+    middlegame = np.einsum('npq,pq->n', counts, MIDDLEGAME_PLANES)
+    endgame = np.einsum('npq,pq->n', counts, ENDGAME_PLANES)
+    phase = np.minimum(counts.sum(axis=2) @ PHASE_PLANES, MAX_PHASE)
+    score = (middlegame * phase + endgame * (MAX_PHASE - phase)) // MAX_PHASE
+    if with_mobility:
+        score += mobility(planes)
+    return score
@@ -0,0 +1,197 @@
+""" Opening book: a sorted binary file of (position hash, move, weight)
+records, read through mmap.
+
+The file is a header followed by fixed size records sorted by hash, so a
+lookup is a binary search touching a handful of pages and nothing is
+parsed or loaded up front. The header holds the hash of the starting
+position: books are keyed by zobrist hash, and a book built with other
+keys would quietly give moves for the wrong positions.
+
+Build one out of games given as moves, packed or in coordinate notation:
+
+    python -m chess.engine.book build games.txt book.bin --plies 30
+
+with one game per line in games.txt, e.g. "e2e4 e7e5 g1f3".
+"""
+import os
+import sys
+import mmap
+import struct
+import logging
+import argparse
+from bisect import bisect_left
+from random import Random
+from pathlib import Path
+from collections import defaultdict, namedtuple
+
+from chess.engine.encoding import NO_MOVE, move_name, parse_move
+from chess.engine.pieces import new_grid
+from chess.engine.position import Position
+
+
+logger = logging.getLogger(Path(__file__).stem)
+
+MAGIC = b'CBK1'
+# magic, hash of the starting position, record count
+HEADER = struct.Struct('<4sQI')
+# hash, move, weight
+RECORD = struct.Struct('<QHH')
+MAX_WEIGHT = 0xFFFF
+# plies of every game going into the book
+BOOK_PLIES = 30
+
+BookMove = namedtuple('BookMove', ['move', 'weight'])
+
+
+class BookError(Exception):
+    """ The file is not a book, or not one built with these zobrist keys """
+
+
+def start_hash():
+    return Position.from_grid(new_grid()).hash
+
+
+class Keys:
+    """ The record hashes of a book as a sequence, for bisect """
+
+    def __init__(self, data, count):
+        self.data = data
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        return RECORD.unpack_from(self.data, HEADER.size + i * RECORD.size)[0]
+
+
+class OpeningBook:
+    """ A book file mapped into memory. Close it, or use it as a context
+    manager, to unmap it """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path, 'rb') as f:
+            # mmap refuses empty files
+            size = os.fstat(f.fileno()).st_size
+            if size < HEADER.size:
+                raise BookError(f'{self.path} is too short to be a book')
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, start, self.count = HEADER.unpack_from(self.data)
+        if size < HEADER.size + self.count * RECORD.size:
+            self.close()
+            raise BookError(f'{self.path} is truncated')
+        if magic != MAGIC:
+            self.close()
+            raise BookError(f'{self.path} is not a book')
+        if start != start_hash():
+            self.close()
+            raise BookError(f'{self.path} was built with other zobrist keys')
+        self.keys = Keys(self.data, self.count)
+
+    def __len__(self):
+        return self.count
+
+    def moves(self, position):
+        """ Book moves of position, legal ones only as hashes can collide """
+        i = bisect_left(self.keys, position.hash)
+        found = []
+        while i < self.count:
+            key, move, weight = RECORD.unpack_from(self.data, HEADER.size + i * RECORD.size)
+            if key != position.hash:
+                break
+            found.append(BookMove(move, weight))
+            i += 1
+        if not found:
+            return []
+        legal = set(position.legal_moves())
+        return [book_move for book_move in found if book_move.move in legal]
+
+    def choose(self, position, rng=None):
+        """ A book move picked at random by weight, NO_MOVE when out of book """
+        moves = self.moves(position)
+        if not moves:
+            return NO_MOVE
+        rng = rng or Random()
+        return rng.choices([m.move for m in moves], [m.weight for m in moves])[0]
+
+    def close(self):
+        self.data.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def count_moves(games, plies=BOOK_PLIES):
+    """ How many games played each move in each position, {(hash, move):
+    count}, out of the first plies of every game. A game stops counting at
+    its first illegal move """
+    counts = defaultdict(int)
+    start = Position.from_grid(new_grid())
+    for number, game in enumerate(games):
+        position = start.copy()
+        for move in list(game)[:plies]:
+            move = parse_move(move) if isinstance(move, str) else move
+            if move not in position.legal_moves():
+                logger.warning('Game %d: illegal move %s, skipping the rest', number, move_name(move))
+                break
+            counts[position.hash, move] += 1
+            position.make(move)
+    return counts
+
+
+def write_book(counts, path, min_count=1):
+    """ Writes a book out of count_moves' counts, leaving out moves played
+    fewer than min_count times. Returns the number of records """
+    records = sorted(
+        (key, move, min(count, MAX_WEIGHT))
+        for (key, move), count in counts.items() if count >= min_count
+    )
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, start_hash(), len(records)))
+        for record in records:
+            f.write(RECORD.pack(*record))
+    return len(records)
+
+
+def build(games, path, plies=BOOK_PLIES, min_count=1):
+    """ Book of the first plies of games at path, returns the record count """
+    return write_book(count_moves(games, plies), path, min_count)
+
+
+def read_games(path):
+    """ Games of a text file, one per line as coordinate moves """
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                yield line.split()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Opening books')
+    commands = parser.add_subparsers(dest='command', required=True)
+    build_parser = commands.add_parser('build', help='build a book out of games')
+    build_parser.add_argument('games', help='text file, one game per line as coordinate moves')
+    build_parser.add_argument('book')
+    build_parser.add_argument('--plies', type=int, default=BOOK_PLIES)
+    build_parser.add_argument('--min-count', type=int, default=1)
+    show_parser = commands.add_parser('show', help='book moves of the starting position')
+    show_parser.add_argument('book')
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        records = build(read_games(args.games), args.book, args.plies, args.min_count)
+        print(f'{records} records written to {args.book}')
+    else:
+        with OpeningBook(args.book) as book:
+            print(f'{len(book)} records')
+            for move, weight in book.moves(Position.from_grid(new_grid())):
+                print(f'{move_name(move)} {weight}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,96 @@
+""" Compact integer encoding of colors, pieces, squares and moves.
+
+Squares are ints 0..63 numbered row * 8 + col, row 0 being black's back rank.
+Pieces are small int codes, color * 10 + type, so a Board grid cell
+(num * 100 + color * 10 + type) turns into one with cell % 100. Colors and
+piece types share their values with chess.engine.pieces.Color and PieceType.
+
+Moves are packed in 16 bits: from square, to square and the piece type a
+pawn promotes to, if any. Move lists are array('H') of packed moves.
+"""
+from array import array
+
+
+BLACK, WHITE = 1, 2
+PAWN, ROOK, KNIGHT, BISHOP, QUEEN, KING = 1, 2, 3, 4, 5, 6
+COLORS = (BLACK, WHITE)
+PIECE_TYPES = (PAWN, ROOK, KNIGHT, BISHOP, QUEEN, KING)
+PROMOTIONS = (QUEEN, ROOK, BISHOP, KNIGHT)
+PIECE_CODES = tuple(color * 10 + type for color in COLORS for type in PIECE_TYPES)
+
+# decoding tables indexed by piece code, 0 for anything that isn't a piece
+COLOR_OF = tuple(code // 10 if code in PIECE_CODES else 0 for code in range(27))
+TYPE_OF = tuple(code % 10 if code in PIECE_CODES else 0 for code in range(27))
+OPPONENT = (0, WHITE, BLACK)
+
+# a1 -> a1 can't be played, so it stands for "no move"
+NO_MOVE = 0
+
+
+def opponent(color):
+    return OPPONENT[color]
+
+
+def piece_code(color, type):
+    return color * 10 + type
+
+
+def square(row, col):
+    return row * 8 + col
+
+
+def encode_move(frm, to, promotion=0):
+    return frm | to << 6 | promotion << 12
+
+
+def move_from(move):
+    return move & 63
+
+
+def move_to(move):
+    return move >> 6 & 63
+
+
+def move_promotion(move):
+    return move >> 12
+
+
+def move_list(moves=()):
+    return array('H', moves)
+
+
+FILES = 'abcdefgh'
+PROMOTION_LETTERS = {QUEEN: 'q', ROOK: 'r', BISHOP: 'b', KNIGHT: 'n'}
+
+
+def square_name(sq):
+    """ Algebraic name of sq, white's back rank being rank 1 """
+    return f'{FILES[sq % 8]}{8 - sq // 8}'
+
+
+def move_name(move):
+    """ Coordinate notation of a packed move, e.g. e2e4 or a7a8q """
+    promotion = move >> 12
+    name = square_name(move & 63) + square_name(move >> 6 & 63)
+    return name + PROMOTION_LETTERS[promotion] if promotion else name
+
+
+def parse_square(name):
+    if len(name) != 2 or name[0] not in FILES or name[1] not in '12345678':
+        raise ValueError(f'Not a square: {name!r}')
+    return (8 - int(name[1])) * 8 + FILES.index(name[0])
+
+
+def parse_move(name):
+    """ Packed move out of coordinate notation, the inverse of move_name.
+    Whether it's legal anywhere is up to the caller """
+    name = name.strip().lower()
+    if len(name) not in (4, 5):
+        raise ValueError(f'Not a move: {name!r}')
+    promotion = 0
+    if len(name) == 5:
+        letters = {letter: type for type, letter in PROMOTION_LETTERS.items()}
+        if name[4] not in letters:
+            raise ValueError(f'Not a promotion: {name!r}')
+        promotion = letters[name[4]]
+    return encode_move(parse_square(name[:2]), parse_square(name[2:4]), promotion)
@@ -0,0 +1,165 @@
+""" Static evaluation of a position, in centipawns from the point of view
+of the side to move.
+
+Material plus piece-square tables, with a middlegame and an endgame score
+blended by how much material is left (the phase). Position keeps both
+scores and the phase up to date as pieces are put, removed and moved, so
+evaluating a leaf is a couple of multiplications. full_score recomputes
+them from scratch to check the incremental ones.
+"""
+from chess.engine.encoding import (
+    WHITE, PAWN, ROOK, KNIGHT, BISHOP, QUEEN, KING, PIECE_CODES, COLOR_OF, TYPE_OF
+)
+
+
+# indexed by piece type, the king is never traded so it's worth nothing
+PIECE_VALUES = (0, 100, 500, 320, 330, 900, 0)
+
+# phase taken off the game by each piece type, 24 for the starting army
+PHASE_WEIGHTS = (0, 0, 2, 1, 1, 4, 0)
+MAX_PHASE = 24
+
+# tables are seen from white's side, rank 8 first like the board's grid,
+# so white reads them by square and black by the mirrored square
+PAWN_TABLE = (
+    0, 0, 0, 0, 0, 0, 0, 0,
+    50, 50, 50, 50, 50, 50, 50, 50,
+    10, 10, 20, 30, 30, 20, 10, 10,
+    5, 5, 10, 25, 25, 10, 5, 5,
+    0, 0, 0, 20, 20, 0, 0, 0,
+    5, -5, -10, 0, 0, -10, -5, 5,
+    5, 10, 10, -20, -20, 10, 10, 5,
+    0, 0, 0, 0, 0, 0, 0, 0,
+)
+# in the endgame pawns are worth their distance to promotion
+PAWN_ENDGAME_TABLE = (
+    0, 0, 0, 0, 0, 0, 0, 0,
+    80, 80, 80, 80, 80, 80, 80, 80,
+    50, 50, 50, 50, 50, 50, 50, 50,
+    30, 30, 30, 30, 30, 30, 30, 30,
+    15, 15, 15, 15, 15, 15, 15, 15,
+    5, 5, 5, 5, 5, 5, 5, 5,
+    0, 0, 0, 0, 0, 0, 0, 0,
+    0, 0, 0, 0, 0, 0, 0, 0,
+)
+KNIGHT_TABLE = (
+    -50, -40, -30, -30, -30, -30, -40, -50,
+    -40, -20, 0, 0, 0, 0, -20, -40,
+    -30, 0, 10, 15, 15, 10, 0, -30,
+    -30, 5, 15, 20, 20, 15, 5, -30,
+    -30, 0, 15, 20, 20, 15, 0, -30,
+    -30, 5, 10, 15, 15, 10, 5, -30,
+    -40, -20, 0, 5, 5, 0, -20, -40,
+    -50, -40, -30, -30, -30, -30, -40, -50,
+)
+BISHOP_TABLE = (
+    -20, -10, -10, -10, -10, -10, -10, -20,
+    -10, 0, 0, 0, 0, 0, 0, -10,
+    -10, 0, 5, 10, 10, 5, 0, -10,
+    -10, 5, 5, 10, 10, 5, 5, -10,
+    -10, 0, 10, 10, 10, 10, 0, -10,
+    -10, 10, 10, 10, 10, 10, 10, -10,
+    -10, 5, 0, 0, 0, 0, 5, -10,
+    -20, -10, -10, -10, -10, -10, -10, -20,
+)
+ROOK_TABLE = (
+    0, 0, 0, 0, 0, 0, 0, 0,
+    5, 10, 10, 10, 10, 10, 10, 5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    0, 0, 0, 5, 5, 0, 0, 0,
+)
+QUEEN_TABLE = (
+    -20, -10, -10, -5, -5, -10, -10, -20,
+    -10, 0, 0, 0, 0, 0, 0, -10,
+    -10, 0, 5, 5, 5, 5, 0, -10,
+    -5, 0, 5, 5, 5, 5, 0, -5,
+    0, 0, 5, 5, 5, 5, 0, -5,
+    -10, 5, 5, 5, 5, 5, 0, -10,
+    -10, 0, 5, 0, 0, 0, 0, -10,
+    -20, -10, -10, -5, -5, -10, -10, -20,
+)
+# the king hides behind its pawns while there are pieces around...
+KING_TABLE = (
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -20, -30, -30, -40, -40, -30, -30, -20,
+    -10, -20, -20, -20, -20, -20, -20, -10,
+    20, 20, 0, 0, 0, 0, 20, 20,
+    20, 30, 10, 0, 0, 10, 30, 20,
+)
+# ...and walks to the center once they are gone
+KING_ENDGAME_TABLE = (
+    -50, -40, -30, -20, -20, -30, -40, -50,
+    -30, -20, -10, 0, 0, -10, -20, -30,
+    -30, -10, 20, 30, 30, 20, -10, -30,
+    -30, -10, 30, 40, 40, 30, -10, -30,
+    -30, -10, 30, 40, 40, 30, -10, -30,
+    -30, -10, 20, 30, 30, 20, -10, -30,
+    -30, -30, 0, 0, 0, 0, -30, -30,
+    -50, -30, -30, -30, -30, -30, -30, -50,
+)
+
+MIDDLEGAME_TABLES = {
+    PAWN: PAWN_TABLE, ROOK: ROOK_TABLE, KNIGHT: KNIGHT_TABLE,
+    BISHOP: BISHOP_TABLE, QUEEN: QUEEN_TABLE, KING: KING_TABLE
+}
+ENDGAME_TABLES = {**MIDDLEGAME_TABLES, PAWN: PAWN_ENDGAME_TABLE, KING: KING_ENDGAME_TABLE}
+
+
+def _scores(tables):
+    """ Material plus table score of every piece code on every square,
+    positive for white and negative for black """
+    scores = []
+    for code in range(27):
+        if code not in PIECE_CODES:
+            scores.append((0,) * 64)
+            continue
+        table, value = tables[TYPE_OF[code]], PIECE_VALUES[TYPE_OF[code]]
+        if COLOR_OF[code] == WHITE:
+            scores.append(tuple(value + table[sq] for sq in range(64)))
+        else:
+            scores.append(tuple(-value - table[sq ^ 56] for sq in range(64)))
+    return tuple(scores)
+
+
+# MIDDLEGAME[code][sq], ENDGAME[code][sq], PHASE[code]
+MIDDLEGAME = _scores(MIDDLEGAME_TABLES)
+ENDGAME = _scores(ENDGAME_TABLES)
+PHASE = tuple(PHASE_WEIGHTS[TYPE_OF[code]] for code in range(27))
+
+
+class EvaluationMismatch(Exception):
+    """ The incrementally kept scores differ from recomputed ones """
+
+
+def full_score(position):
+    """ Middlegame score, endgame score and phase of position computed
+    from scratch """
+    middlegame = endgame = phase = 0
+    for sq, code in enumerate(position.squares):
+        if code:
+            middlegame += MIDDLEGAME[code][sq]
+            endgame += ENDGAME[code][sq]
+            phase += PHASE[code]
+    return middlegame, endgame, phase
+
+
+def check_score(position):
+    """ Raises EvaluationMismatch unless the scores kept by position are
+    the recomputed ones """
+    expected = full_score(position)
+    kept = (position.middlegame, position.endgame, position.phase)
+    if kept != expected:
+        raise EvaluationMismatch(f'Kept {kept!r}, recomputed {expected!r}')
+
+
+def evaluate(position):
+    phase = min(position.phase, MAX_PHASE)
+    score = (position.middlegame * phase + position.endgame * (MAX_PHASE - phase)) // MAX_PHASE
+    return score if position.turn == WHITE else -score
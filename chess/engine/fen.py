@@ -0,0 +1,117 @@
+""" FEN strings in and out of grids and positions.
+
+This project has no en passant, so the en passant field is always written
+as - and ignored when read. Grids number the pieces of every code in
+reading order, rank 8 first, which gives the rooks in the corners the
+numbers the board expects for castling.
+"""
+from collections import namedtuple
+
+from chess.engine.encoding import WHITE, BLACK, COLOR_OF, TYPE_OF, piece_code
+from chess.engine.position import Position, LEFT_CASTLE, RIGHT_CASTLE
+
+
+START_FEN = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'
+
+PIECE_LETTERS = {'p': 1, 'r': 2, 'n': 3, 'b': 4, 'q': 5, 'k': 6}
+TYPE_LETTERS = {type: letter for letter, type in PIECE_LETTERS.items()}
+# castling right of every FEN letter, kingside being the right castle
+CASTLING_LETTERS = {
+    'K': RIGHT_CASTLE[WHITE], 'Q': LEFT_CASTLE[WHITE],
+    'k': RIGHT_CASTLE[BLACK], 'q': LEFT_CASTLE[BLACK],
+}
+
+Fen = namedtuple('Fen', ['grid', 'turn', 'castling', 'halfmove', 'fullmove'])
+
+
+class FenError(ValueError):
+    """ A string that isn't FEN """
+
+
+def grid_from_placement(placement):
+    """ Board grid out of the piece placement part of a FEN string """
+    grid = [[0] * 8 for _ in range(8)]
+    counts = {}
+    ranks = placement.split('/')
+    if len(ranks) != 8:
+        raise FenError(f'Expected 8 ranks in {placement!r}')
+    for row, rank in enumerate(ranks):
+        col = 0
+        for char in rank:
+            if char.isdigit():
+                col += int(char)
+                continue
+            if char.lower() not in PIECE_LETTERS or col > 7:
+                raise FenError(f'Bad rank {rank!r} in {placement!r}')
+            code = piece_code(WHITE if char.isupper() else BLACK, PIECE_LETTERS[char.lower()])
+            counts[code] = counts.get(code, 0) + 1
+            grid[row][col] = counts[code] * 100 + code
+            col += 1
+        if col != 8:
+            raise FenError(f'Bad rank {rank!r} in {placement!r}')
+    return grid
+
+
+def placement_of(squares):
+    """ Piece placement part of FEN for a grid, or the 64 piece codes of
+    a position """
+    if len(squares) == 8:
+        squares = [cell for row in squares for cell in row]
+    ranks = []
+    for row in range(8):
+        rank, empty = '', 0
+        for cell in squares[row * 8:row * 8 + 8]:
+            code = int(cell) % 100
+            if not code:
+                empty += 1
+                continue
+            if empty:
+                rank, empty = rank + str(empty), 0
+            letter = TYPE_LETTERS[TYPE_OF[code]]
+            rank += letter.upper() if COLOR_OF[code] == WHITE else letter
+        ranks.append(rank + (str(empty) if empty else ''))
+    return '/'.join(ranks)
+
+
+def castling_of(field):
+    if field == '-':
+        return 0
+    if any(letter not in CASTLING_LETTERS for letter in field):
+        raise FenError(f'Bad castling rights {field!r}')
+    rights = 0
+    for letter in field:
+        rights |= CASTLING_LETTERS[letter]
+    return rights
+
+
+def castling_field(rights):
+    return ''.join(letter for letter, right in CASTLING_LETTERS.items() if rights & right) or '-'
+
+
+def parse_fen(fen) -> Fen:
+    """ Grid, side to move, castling rights and move counters of a FEN
+    string. The counters may be left out """
+    fields = fen.split()
+    if len(fields) < 4:
+        raise FenError(f'Expected at least 4 fields in {fen!r}')
+    if fields[1] not in ('w', 'b'):
+        raise FenError(f'Bad side to move in {fen!r}')
+    counters = fields[4:6]
+    try:
+        halfmove = int(counters[0]) if len(counters) > 0 else 0
+        fullmove = int(counters[1]) if len(counters) > 1 else 1
+    except ValueError:
+        raise FenError(f'Bad move counters in {fen!r}') from None
+    turn = WHITE if fields[1] == 'w' else BLACK
+    return Fen(grid_from_placement(fields[0]), turn, castling_of(fields[2]), halfmove, fullmove)
+
+
+def position_from_fen(fen) -> Position:
+    parsed = parse_fen(fen)
+    return Position.from_grid(parsed.grid, turn=parsed.turn, castling=parsed.castling)
+
+
+def fen_of(position, halfmove=0, fullmove=1):
+    """ FEN string of a Position """
+    turn = 'w' if position.turn == WHITE else 'b'
+    return f'{placement_of(position.squares)} {turn} {castling_field(position.castling)} - {halfmove} {fullmove}'
@@ -0,0 +1,76 @@
+""" Headless game loop: two engine players take turns on a Position until
+the game ends or hits a ply limit. Nothing here touches pygame, so games
+can run by the thousand on machines without a display. """
+import time
+import logging
+from pathlib import Path
+from enum import Enum
+from array import array
+from dataclasses import dataclass, field
+from typing import Optional
+
+from chess.engine.encoding import WHITE, BLACK, OPPONENT, move_list
+from chess.engine.pieces import new_grid
+from chess.engine.position import Position
+
+
+logger = logging.getLogger(Path(__file__).stem)
+
+MAX_PLIES = 500
+
+
+class GameStatus(Enum):
+    playing = 0
+    checkmate = 1
+    stalemate = 2
+
+
+def game_status(position, color=None) -> GameStatus:
+    """ Whether color (the side to move by default) has been mated or
+    stalemated """
+    color = color or position.turn
+    if position.legal_moves(color):
+        return GameStatus.playing
+    if position.in_check(color):
+        return GameStatus.checkmate
+    return GameStatus.stalemate
+
+
+@dataclass
+class GameResult:
+    # playing when the game was stopped at the ply limit
+    status: GameStatus
+    # color of the winner, None for a stalemate or an unfinished game
+    winner: Optional[int]
+    moves: array = field(default_factory=move_list)
+    seconds: float = 0.0
+
+    @property
+    def plies(self):
+        return len(self.moves)
+
+    @property
+    def score(self):
+        """ White's score: 1 for a win, 0.5 for a draw, 0 for a loss """
+        if self.winner is None:
+            return 0.5
+        return 1.0 if self.winner == WHITE else 0.0
+
+
+def play(white, black, position=None, max_plies=MAX_PLIES) -> GameResult:
+    """ Plays white against black from position (the starting grid by
+    default), which is played on in place """
+    position = position if position is not None else Position.from_grid(new_grid())
+    players = {WHITE: white, BLACK: black}
+    moves = move_list()
+    start = time.perf_counter()
+    status = game_status(position)
+    while status == GameStatus.playing and len(moves) < max_plies:
+        move = players[position.turn].choose(position)
+        position.make(move)
+        moves.append(move)
+        status = game_status(position)
+    winner = OPPONENT[position.turn] if status == GameStatus.checkmate else None
+    result = GameResult(status, winner, moves, time.perf_counter() - start)
+    logger.debug('%s after %d plies', status.name, result.plies)
+    return result
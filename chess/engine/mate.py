@@ -0,0 +1,327 @@
+""" Mate in N solver using proof-number search.
+
+The side to move is the attacker. The solver grows an AND/OR tree: the
+attacker needs one move that mates (OR nodes) and every defence has to
+lose (AND nodes). Each node keeps a proof number and a disproof number,
+how many leaves at least are still to be solved to prove or disprove it.
+Every step expands the most proving leaf, the one reached by following
+the smallest proof number at OR nodes and the smallest disproof number at
+AND nodes, so the search goes deep on forcing lines, where a full width
+search would look at every move to the same depth. It stops once the root
+is proved (a mate) or disproved (no mate in N), or at the node budget.
+
+The same position is often reached by different move orders, so solved
+positions are remembered by hash: one mated in p plies is mated with any
+more plies to spare, one that can't be mated in p plies can't with fewer.
+
+Solve a file of puzzles, one JSON object per line with "mate_in" and
+either a "fen" or a "grid" (the board's grid format) or FEN "placement"
+and a "turn":
+
+    python -m chess.engine.mate puzzles.jsonl --workers 4 --out results.jsonl
+"""
+import sys
+import json
+import time
+import logging
+import argparse
+import multiprocessing as mp
+from enum import Enum
+from pathlib import Path
+from dataclasses import dataclass, field
+from typing import List
+from itertools import islice
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from chess.engine.encoding import WHITE, BLACK, NO_MOVE, move_name
+from chess.engine.position import Position
+from chess.engine.fen import grid_from_placement, position_from_fen
+
+
+logger = logging.getLogger(Path(__file__).stem)
+
+INFINITE = 1 << 30
+MAX_NODES = 1_000_000
+# puzzles handed to a worker at once, and chunks read ahead per worker
+CHUNK = 8
+AHEAD = 2
+COLOR_NAMES = {'white': WHITE, 'black': BLACK}
+
+
+class MateStatus(Enum):
+    mate = 0
+    no_mate = 1
+    # ran out of nodes before proving either
+    unknown = 2
+
+
+@dataclass
+class MateResult:
+    status: MateStatus
+    # attacker's first move and the forced line, when there's a mate
+    move: int = NO_MOVE
+    line: List[int] = field(default_factory=list)
+    nodes: int = 0
+    # bytes taken by the tree at its largest, roughly
+    memory: int = 0
+    seconds: float = 0.0
+
+    @property
+    def nps(self):
+        return self.nodes / self.seconds if self.seconds else 0.0
+
+
+class Node:
+    __slots__ = ('move', 'parent', 'children', 'moves', 'proof', 'disproof', 'attacker', 'plies')
+
+    def __init__(self, move, parent, attacker, plies):
+        self.move = move
+        self.parent = parent
+        self.children = None
+        # legal moves, kept from the node's evaluation for its expansion
+        self.moves = None
+        self.proof = 1
+        self.disproof = 1
+        # whether the attacker is to move (an OR node)
+        self.attacker = attacker
+        # plies left for the attacker to mate in
+        self.plies = plies
+
+
+# a node and its list of children, give or take
+NODE_BYTES = sys.getsizeof(Node(NO_MOVE, None, True, 0)) + sys.getsizeof([None] * 8)
+# an entry of the solved positions' dicts, give or take
+ENTRY_BYTES = 100
+
+
+class MateSearch:
+    def __init__(self, max_nodes=MAX_NODES):
+        self.max_nodes = max_nodes
+        self.nodes = 0
+        # fewest plies each solved position was mated in, and most plies
+        # it couldn't be mated in
+        self.proved = {}
+        self.disproved = {}
+
+    def evaluate(self, node, position):
+        """ Proof and disproof numbers of a new node """
+        if self.proved.get(position.hash, INFINITE) <= node.plies:
+            node.proof, node.disproof = 0, INFINITE
+            return
+        if self.disproved.get(position.hash, -1) >= node.plies:
+            node.proof, node.disproof = INFINITE, 0
+            return
+        node.moves = position.legal_moves()
+        if not node.moves:
+            mated = position.check
+            # mated attacker or stalemate: no mate, mated defender: mate
+            proved = mated and not node.attacker
+            node.proof, node.disproof = (0, INFINITE) if proved else (INFINITE, 0)
+        elif node.plies == 0:
+            # the attacker's moves are spent and the defender isn't mated
+            node.proof, node.disproof = INFINITE, 0
+        elif node.attacker:
+            # one mating move is enough, every one has to fail to disprove
+            node.proof, node.disproof = 1, len(node.moves)
+        else:
+            node.proof, node.disproof = len(node.moves), 1
+
+    def expand(self, node, position):
+        node.children = []
+        for move in node.moves:
+            child = Node(move, node, not node.attacker, node.plies - 1)
+            position.make(move)
+            self.evaluate(child, position)
+            position.unmake()
+            node.children.append(child)
+            self.nodes += 1
+            # a proved child settles an OR node, a disproved one an AND node
+            if (child.proof == 0 and node.attacker) or (child.disproof == 0 and not node.attacker):
+                break
+        node.moves = None
+
+    @staticmethod
+    def update(node):
+        if node.attacker:
+            node.proof = min(child.proof for child in node.children)
+            node.disproof = min(sum(child.disproof for child in node.children), INFINITE)
+        else:
+            node.proof = min(sum(child.proof for child in node.children), INFINITE)
+            node.disproof = min(child.disproof for child in node.children)
+
+    def remember(self, node, key):
+        if node.proof == 0:
+            self.proved[key] = min(self.proved.get(key, INFINITE), node.plies)
+        elif node.disproof == 0:
+            self.disproved[key] = max(self.disproved.get(key, -1), node.plies)
+
+    def most_proving(self, node, position):
+        """ Leaf to expand next, with its moves made on position """
+        while node.children is not None:
+            if node.attacker:
+                node = min(node.children, key=lambda child: child.proof)
+            else:
+                node = min(node.children, key=lambda child: child.disproof)
+            position.make(node.move)
+        return node
+
+    def run(self, position, mate_in) -> MateResult:
+        """ Mate in mate_in moves for the side to move of position, which is
+        left untouched """
+        start = time.perf_counter()
+        position = position.copy()
+        self.nodes = 1
+        self.proved, self.disproved = {}, {}
+        root = Node(NO_MOVE, None, True, 2 * mate_in - 1)
+        self.evaluate(root, position)
+        while root.proof and root.disproof and self.nodes < self.max_nodes:
+            node = self.most_proving(root, position)
+            self.expand(node, position)
+            # back up to the root, unmaking the moves on the way
+            while node is not None:
+                if node.children:
+                    self.update(node)
+                    self.remember(node, position.hash)
+                if node.parent is not None:
+                    position.unmake()
+                node = node.parent
+
+        if root.proof == 0:
+            status = MateStatus.mate
+        elif root.disproof == 0:
+            status = MateStatus.no_mate
+        else:
+            status = MateStatus.unknown
+        line = self.line(root, position) if status == MateStatus.mate else []
+        result = MateResult(
+            status, line[0] if line else NO_MOVE, line, self.nodes,
+            self.nodes * NODE_BYTES + (len(self.proved) + len(self.disproved)) * ENTRY_BYTES,
+            time.perf_counter() - start
+        )
+        logger.debug('%s in %d nodes, %.0f nps', status.name, result.nodes, result.nps)
+        return result
+
+    def line(self, root, position):
+        """ Moves of a proved tree: a mating move of the attacker, then the
+        defence that holds out longest as far as the tree knows. Nodes
+        proved out of the solved positions have no children, the line goes
+        on from them with a search of their own """
+        line = []
+        node = root
+        while node.children:
+            proved = [child for child in node.children if child.proof == 0]
+            if node.attacker:
+                node = proved[0]
+            else:
+                node = max(proved, key=depth)
+            line.append(node.move)
+        for move in line:
+            position.make(move)
+        rest = self.finish(position, node.plies, node.attacker) if position.legal_moves() else []
+        for _ in line:
+            position.unmake()
+        return line + rest
+
+    def finish(self, position, plies, attacker):
+        """ Rest of the line from a position known to be mated within plies """
+        if attacker:
+            return MateSearch(self.max_nodes).run(position, (plies + 1) // 2).line
+        # every defence loses, keep the one that lasts longest
+        longest = []
+        for move in position.legal_moves():
+            position.make(move)
+            rest = MateSearch(self.max_nodes).run(position, plies // 2).line
+            position.unmake()
+            if len(rest) + 1 > len(longest):
+                longest = [move] + rest
+        return longest
+
+
+def depth(node):
+    """ Plies of the deepest line under node """
+    if not node.children:
+        return 0
+    return 1 + max(depth(child) for child in node.children)
+
+
+def solve(grid, mate_in, turn=WHITE, max_nodes=MAX_NODES) -> MateResult:
+    """ Mate in mate_in moves for turn on a board grid, or proof there's
+    none """
+    position = Position.from_grid(grid, turn=turn)
+    return MateSearch(max_nodes).run(position, mate_in)
+
+
+def _solve_line(line, max_nodes):
+    """ Result of one puzzle line of a batch file, as a dict """
+    puzzle = json.loads(line)
+    if 'fen' in puzzle:
+        position = position_from_fen(puzzle['fen'])
+    else:
+        grid = puzzle['grid'] if 'grid' in puzzle else grid_from_placement(puzzle['placement'])
+        position = Position.from_grid(grid, turn=COLOR_NAMES[puzzle.get('turn', 'white')])
+    result = MateSearch(max_nodes).run(position, puzzle['mate_in'])
+    return {
+        **{key: value for key, value in puzzle.items() if key not in ('grid', 'placement', 'fen')},
+        'status': result.status.name,
+        'line': [move_name(move) for move in result.line],
+        'nodes': result.nodes,
+        'memory': result.memory,
+        'seconds': round(result.seconds, 4),
+    }
+
+
+def _solve_lines(lines, max_nodes):
+    return [_solve_line(line, max_nodes) for line in lines]
+
+
+def solve_batch(lines, workers=1, max_nodes=MAX_NODES):
+    """ Yields the result of every puzzle line, in order, solved over a
+    pool of worker processes """
+    lines = (line for line in lines if line.strip())
+    if workers == 1:
+        for line in lines:
+            yield _solve_line(line, max_nodes)
+        return
+    with ProcessPoolExecutor(workers, mp_context=mp.get_context('spawn')) as pool:
+        # puzzles are small and many, so they go out a chunk at a time, and
+        # only a few chunks a worker are read ahead
+        pending = deque()
+        while True:
+            chunk = list(islice(lines, CHUNK))
+            if chunk:
+                pending.append(pool.submit(_solve_lines, chunk, max_nodes))
+            if pending and (len(pending) >= workers * AHEAD or not chunk):
+                yield from pending.popleft().result()
+            elif not chunk:
+                return
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Mate in N solver')
+    parser.add_argument('puzzles', help='JSON lines with mate_in and fen, grid or placement')
+    parser.add_argument('--workers', '-w', type=int, default=1)
+    parser.add_argument('--nodes', type=int, default=MAX_NODES, help='node budget per puzzle')
+    parser.add_argument('--out', '-o', help='results file, standard output by default')
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    counts = {status.name: 0 for status in MateStatus}
+    out = open(args.out, 'w') if args.out else sys.stdout
+    try:
+        with open(args.puzzles) as f:
+            for result in solve_batch(f, args.workers, args.nodes):
+                counts[result['status']] += 1
+                out.write(json.dumps(result) + '\n')
+    finally:
+        if args.out:
+            out.close()
+    seconds = time.perf_counter() - start
+    total = sum(counts.values())
+    print(f'{total} puzzles in {seconds:.1f}s ({total / seconds if seconds else 0:.1f}/s): '
+          + ', '.join(f'{count} {name}' for name, count in counts.items()), file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
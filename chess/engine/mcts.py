@@ -0,0 +1,210 @@
+""" Monte Carlo tree search with UCT selection.
+
+Every iteration walks down the tree picking the child with the best upper
+confidence bound, adds one new node, plays a random game out from it and
+backs the result up to the root. Moves are made and taken back on a single
+Position, no copies. The tree is kept between turns: when the position to
+search is a grandchild of the last root (our move, then the rival's reply)
+the search carries on from there.
+"""
+import math
+import time
+import logging
+from random import Random
+from pathlib import Path
+from dataclasses import dataclass
+from typing import Optional
+
+from chess.engine.encoding import NO_MOVE, TYPE_OF
+from chess.engine.evaluation import evaluate, PIECE_VALUES
+
+
+logger = logging.getLogger(Path(__file__).stem)
+
+EXPLORATION = 1.4
+# playouts longer than this are scored by the evaluation
+PLAYOUT_PLIES = 60
+# centipawn edge making a win ten times as likely as a loss
+SCORE_SCALE = 400
+# chance of a guided playout taking the best capture around
+GUIDANCE = 0.7
+
+
+@dataclass
+class TreeLimits:
+    # None for no limit, at least one playout is always run
+    playouts: Optional[int] = None
+    seconds: Optional[float] = 1.0
+
+
+@dataclass
+class TreeResult:
+    move: int
+    # share of the playouts through move that were won
+    win_rate: float
+    playouts: int
+    seconds: float
+    # playouts already in the tree when the search started
+    reused: int = 0
+
+    @property
+    def playouts_per_second(self):
+        return self.playouts / self.seconds if self.seconds else 0.0
+
+
+class Node:
+    __slots__ = ('move', 'parent', 'key', 'children', 'untried', 'visits', 'wins')
+
+    def __init__(self, move=NO_MOVE, parent=None, key=None):
+        self.move = move
+        self.parent = parent
+        # hash of the position after move
+        self.key = key
+        self.children = []
+        # moves still without a child, None until the node is first reached
+        self.untried = None
+        self.visits = 0
+        # playouts won by the side that played move
+        self.wins = 0.0
+
+    def select(self):
+        log_visits = math.log(self.visits)
+        return max(
+            self.children,
+            key=lambda child: child.wins / child.visits
+            + EXPLORATION * math.sqrt(log_visits / child.visits)
+        )
+
+    def find(self, key):
+        for child in self.children:
+            if child.key == key:
+                return child
+        return None
+
+
+class TreeSearch:
+    def __init__(self, guided=True, seed=None, stop_event=None):
+        self.guided = guided
+        self.rng = Random(seed)
+        self.root = None
+        # event shared with other threads, stops the search once set
+        self.stop_event = stop_event
+        # set from elsewhere to make the running search give up
+        self.stopped = False
+
+    def stop(self):
+        self.stopped = True
+
+    def reuse(self, position, detach=True):
+        """ Root node for position, out of the last tree if it's there. Cut
+        off from its parent unless detach is False, then its playouts go on
+        being counted by the nodes above it """
+        if self.root is not None:
+            # the last root is the position after our move
+            node = self.root.find(position.hash)
+            if node is not None:
+                if detach:
+                    node.parent = None
+                return node
+        return Node(key=position.hash)
+
+    def run(self, position, limits=None, detach=True) -> TreeResult:
+        """ Most visited move of the side to move, position left untouched.
+        detach goes to reuse """
+        limits = limits or TreeLimits()
+        position = position.copy()
+        start = time.perf_counter()
+        deadline = start + limits.seconds if limits.seconds is not None else None
+        root = self.reuse(position, detach)
+        reused = root.visits
+        playouts = 0
+        self.stopped = False
+        while True:
+            self.iterate(root, position)
+            playouts += 1
+            if self.stopped or (self.stop_event is not None and self.stop_event.is_set()):
+                break
+            if limits.playouts is not None and playouts >= limits.playouts:
+                break
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+
+        self.root = root
+        seconds = time.perf_counter() - start
+        if not root.children:
+            return TreeResult(NO_MOVE, 0.0, playouts, seconds, reused)
+        best = max(root.children, key=lambda child: child.visits)
+        # keep the chosen subtree for the next turn
+        self.root = best
+        result = TreeResult(best.move, best.wins / best.visits, playouts, seconds, reused)
+        logger.debug('%d playouts, %d reused, %.0f per second', playouts, reused,
+                     result.playouts_per_second)
+        return result
+
+    def iterate(self, root, position):
+        node = root
+        made = 0
+        # selection
+        while node.untried is not None and not node.untried and node.children:
+            node = node.select()
+            position.make(node.move)
+            made += 1
+        # expansion
+        if node.untried is None:
+            node.untried = list(position.legal_moves())
+            self.rng.shuffle(node.untried)
+        if node.untried:
+            move = node.untried.pop()
+            position.make(move)
+            made += 1
+            child = Node(move, node, position.hash)
+            node.children.append(child)
+            node = child
+        # the playout scores it for the side to move, who didn't play node.move
+        reward = 1.0 - self.playout(position)
+        for _ in range(made):
+            position.unmake()
+        # backpropagation
+        while node is not None:
+            node.visits += 1
+            node.wins += reward
+            reward = 1.0 - reward
+            node = node.parent
+
+    def playout(self, position):
+        """ Result of a random game out of position for its side to move:
+        1 won, 0 lost, in between for a draw or an unfinished game """
+        made = 0
+        result = None
+        for _ in range(PLAYOUT_PLIES):
+            moves = position.legal_moves()
+            if not moves:
+                # mated or stalemated; every other ply the loser is the one
+                # the result is for
+                lost = 0.0 if position.check else 0.5
+                result = lost if made % 2 == 0 else 1.0 - lost
+                break
+            position.make(self.pick(position, moves))
+            made += 1
+        if result is None:
+            score = evaluate(position)
+            if made % 2:
+                score = -score
+            result = 1.0 / (1.0 + 10 ** (-score / SCORE_SCALE))
+        for _ in range(made):
+            position.unmake()
+        return result
+
+    def pick(self, position, moves):
+        if self.guided and self.rng.random() < GUIDANCE:
+            squares = position.squares
+            best, gain = None, 0
+            for move in moves:
+                victim = squares[move >> 6 & 63]
+                if victim:
+                    value = PIECE_VALUES[TYPE_OF[victim]] * 8 - PIECE_VALUES[TYPE_OF[squares[move & 63]]]
+                    if value > gain:
+                        best, gain = move, value
+            if best is not None:
+                return best
+        return self.rng.choice(moves)
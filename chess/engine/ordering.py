@@ -0,0 +1,92 @@
+""" Move ordering for the alpha-beta search.
+
+Moves are tried in this order: the move stored in the transposition table,
+captures and promotions by MVV-LVA (most valuable victim first, cheapest
+attacker breaking ties), the two killer moves of the ply and then quiet
+moves by their history score.
+"""
+from dataclasses import dataclass
+
+from chess.engine.encoding import NO_MOVE, TYPE_OF
+from chess.engine.evaluation import PIECE_VALUES
+
+
+HASH_MOVE = 1 << 30
+CAPTURE = 1 << 26
+KILLER = 1 << 24
+# history scores are halved when they get here, so they stay below killers
+HISTORY_CAP = 1 << 20
+MAX_PLY = 128
+# cheaper attackers sort first among captures of the same victim, the
+# king (type 6) being the most expensive of all
+ATTACKER_RANK = (0, 0, 3, 1, 2, 4, 5)
+
+
+@dataclass
+class OrderingStats:
+    # nodes where some move beat beta
+    cutoffs: int = 0
+    # ... and it was the first move tried
+    first_move_cutoffs: int = 0
+
+    @property
+    def first_move_rate(self):
+        return self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0.0
+
+
+class MoveOrderer:
+    def __init__(self):
+        # two killer moves per ply: quiet moves that caused a cutoff
+        self.killers = [[NO_MOVE, NO_MOVE] for _ in range(MAX_PLY)]
+        # indexed by piece code * 64 + destination square
+        self.history = [0] * (27 * 64)
+        self.stats = OrderingStats()
+
+    def new_search(self):
+        """ Killers belong to the last position, history is only aged """
+        for killers in self.killers:
+            killers[0] = killers[1] = NO_MOVE
+        self.history = [score >> 1 for score in self.history]
+        self.stats = OrderingStats()
+
+    def order(self, position, moves, ply, hash_move=NO_MOVE):
+        """ moves sorted best first """
+        squares = position.squares
+        history = self.history
+        first, second = self.killers[ply] if ply < MAX_PLY else (NO_MOVE, NO_MOVE)
+
+        def score(move):
+            if move == hash_move:
+                return HASH_MOVE
+            frm, to, promotion = move & 63, move >> 6 & 63, move >> 12
+            victim = squares[to]
+            if victim or promotion:
+                return CAPTURE + (PIECE_VALUES[TYPE_OF[victim]] + PIECE_VALUES[promotion]) * 8 \
+                    - ATTACKER_RANK[TYPE_OF[squares[frm]]]
+            if move == first:
+                return KILLER + 1
+            if move == second:
+                return KILLER
+            return history[squares[frm] * 64 + to]
+
+        return sorted(moves, key=score, reverse=True)
+
+    def is_quiet(self, position, move):
+        return not position.squares[move >> 6 & 63] and not move >> 12
+
+    def cutoff(self, position, move, depth, ply, index):
+        """ Records that move, the index-th tried, beat beta in position.
+        Called once the move is taken back """
+        self.stats.cutoffs += 1
+        if not index:
+            self.stats.first_move_cutoffs += 1
+        if not self.is_quiet(position, move):
+            return
+        if ply < MAX_PLY:
+            killers = self.killers[ply]
+            if killers[0] != move:
+                killers[1], killers[0] = killers[0], move
+        slot = position.squares[move & 63] * 64 + (move >> 6 & 63)
+        self.history[slot] += depth * depth
+        if self.history[slot] >= HISTORY_CAP:
+            self.history = [score >> 1 for score in self.history]
@@ -0,0 +1,157 @@
+""" Lazy SMP: several processes search the same position at once, sharing
+what they find through a transposition table in shared memory.
+
+Workers are started once and wait for positions on a queue, so a game pays
+for process start up a single time. Every worker runs a full iterative
+deepening search; helpers order the root differently and half of them
+start a ply deeper, and their table entries let the others skip work.
+When the first worker is done the rest are told to stop, and the deepest
+result wins, the first worker's on a tie.
+
+Benchmark it with
+
+    python -m chess.engine.parallel --workers 1 2 4 --depth 5
+"""
+import sys
+import time
+import logging
+import argparse
+import multiprocessing as mp
+from multiprocessing.shared_memory import SharedMemory
+from pathlib import Path
+from dataclasses import dataclass
+
+from chess.engine.position import position_state, position_from_state
+from chess.engine.search import Search, SearchLimits, SearchResult
+from chess.engine.transposition import TranspositionTable, BUCKET, ENTRY_SIZE
+
+
+logger = logging.getLogger(Path(__file__).stem)
+
+
+def _worker(index, memory_name, size, tasks, results, stop_event):
+    memory = SharedMemory(name=memory_name)
+    table = TranspositionTable(buffer=memory.buf[:size])
+    search = Search(table, stop_event=stop_event, helper=index)
+    try:
+        for task in iter(tasks.get, None):
+            state, limits = task
+            result = search.run(position_from_state(state), limits)
+            results.put((index, result))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        table.release()
+        memory.close()
+
+
+@dataclass
+class ParallelResult(SearchResult):
+    workers: int = 1
+
+
+class SearchPool:
+    """ Persistent worker processes searching over a shared table. Close it
+    (or use it as a context manager) to stop them """
+
+    def __init__(self, workers=2, table_mb=64):
+        self.workers = workers
+        self.size = TranspositionTable.buckets_for(table_mb) * BUCKET * ENTRY_SIZE
+        self.memory = SharedMemory(create=True, size=self.size)
+        self.memory.buf[:self.size] = bytes(self.size)
+        # the pool's own view of the table, to read the principal variation
+        self.table = TranspositionTable(buffer=self.memory.buf[:self.size])
+        # workers don't need anything from the parent, so they are spawned
+        # clean instead of forked out of a process running pygame
+        context = mp.get_context('spawn')
+        self.stop_event = context.Event()
+        self.tasks = [context.Queue() for _ in range(workers)]
+        self.results = context.Queue()
+        self.processes = [
+            context.Process(
+                target=_worker,
+                args=(i, self.memory.name, self.size, self.tasks[i], self.results, self.stop_event),
+                daemon=True
+            )
+            for i in range(workers)
+        ]
+        for process in self.processes:
+            process.start()
+
+    def run(self, position, limits=None) -> ParallelResult:
+        limits = limits or SearchLimits()
+        start = time.perf_counter()
+        self.stop_event.clear()
+        state = position_state(position)
+        for tasks in self.tasks:
+            tasks.put((state, limits))
+        results = {}
+        while len(results) < self.workers:
+            index, result = self.results.get()
+            results[index] = result
+            if index == 0:
+                # the main search is done, helpers only matter while it runs
+                self.stop_event.set()
+        seconds = time.perf_counter() - start
+
+        best = max(results.values(), key=lambda result: result.depth)
+        if best.depth == results[0].depth:
+            best = results[0]
+        nodes = sum(result.nodes for result in results.values())
+        return ParallelResult(
+            best.move, best.score, best.depth, nodes, seconds, best.pv,
+            workers=self.workers
+        )
+
+    def stop(self):
+        """ Makes the running search return what it has """
+        self.stop_event.set()
+
+    def close(self):
+        for tasks in self.tasks:
+            tasks.put(None)
+        for process in self.processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        self.table.release()
+        self.memory.close()
+        self.memory.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def benchmark(position, workers=(1, 2, 4), depth=5, table_mb=64):
+    """ Time to reach depth with every worker count, and the speedup over
+    the first one. Yields (workers, result, speedup) """
+    base = None
+    for count in workers:
+        with SearchPool(count, table_mb) as pool:
+            result = pool.run(position, SearchLimits(seconds=None, depth=depth))
+        base = base or result.seconds
+        yield count, result, base / result.seconds if result.seconds else 0.0
+
+
+def main(argv=None):
+    from chess.engine.perft import POSITIONS
+
+    parser = argparse.ArgumentParser(description='Parallel search speedup')
+    parser.add_argument('--workers', '-w', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--depth', '-d', type=int, default=5)
+    parser.add_argument('--position', '-p', choices=sorted(POSITIONS), default='kiwipete')
+    parser.add_argument('--table', type=int, default=64, help='table size in MB')
+    args = parser.parse_args(argv)
+
+    position = POSITIONS[args.position].position()
+    for count, result, speedup in benchmark(position, args.workers, args.depth, args.table):
+        print(f'{count:3} workers  depth {result.depth}  {result.nodes:>9} nodes '
+              f'{result.seconds:7.2f}s {result.nps:>9.0f} nps  speedup {speedup:.2f}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
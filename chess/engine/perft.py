@@ -0,0 +1,164 @@
+""" Perft: counts the leaf nodes of the legal move tree to a fixed depth.
+
+Used to benchmark move generation and to catch regressions when it gets
+rewritten. Run it with
+
+    python -m chess.engine.perft --position start --depth 4 --divide
+
+Counts follow this project's rules (no en passant, a first pawn move only
+needs its landing square free, castling checks the two squares the king
+walks through), so they differ from the usual published numbers.
+"""
+import sys
+import time
+import logging
+import argparse
+from pathlib import Path
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+from chess.engine.encoding import WHITE, move_name
+from chess.engine.fen import grid_from_placement
+from chess.engine.position import Position
+from chess.engine.pieces import new_grid, test_grid
+
+
+logger = logging.getLogger(Path(__file__).stem)
+
+
+class PerftMismatch(Exception):
+    """ A perft count differs from the expected one """
+
+
+@dataclass
+class PerftPosition:
+    name: str
+    grid: list
+    turn: int = WHITE
+    # expected leaf count per depth, starting at depth 1
+    expected: List[int] = field(default_factory=list)
+
+    def position(self):
+        return Position.from_grid(self.grid, turn=self.turn)
+
+
+SUITE = [
+    PerftPosition('start', new_grid(), WHITE, [20, 400, 8982, 200915]),
+    PerftPosition('test', test_grid(), WHITE, [29, 106, 3526, 19127, 699357]),
+    PerftPosition(
+        'kiwipete',
+        grid_from_placement('r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R'),
+        WHITE, [51, 2268, 114649]
+    ),
+    PerftPosition(
+        'endgame',
+        grid_from_placement('8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8'),
+        WHITE, [14, 191, 2821, 43352, 679933]
+    ),
+    PerftPosition(
+        'promotions',
+        grid_from_placement('r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1'),
+        WHITE, [6, 282, 10139]
+    ),
+    PerftPosition(
+        'middlegame',
+        grid_from_placement('r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1'),
+        WHITE, [46, 2083, 90711]
+    ),
+]
+POSITIONS: Dict[str, PerftPosition] = {p.name: p for p in SUITE}
+
+
+def perft(position, depth, generator='legal_moves'):
+    """ Number of leaf nodes depth plies below position. generator names
+    the Position method listing the moves """
+    moves = getattr(position, generator)()
+    if depth <= 1:
+        return len(moves) if depth == 1 else 1
+    nodes = 0
+    for move in moves:
+        position.make(move)
+        nodes += perft(position, depth - 1, generator)
+        position.unmake()
+    return nodes
+
+
+def divide(position, depth, generator='legal_moves'):
+    """ Leaf count below every move of position """
+    counts = {}
+    for move in getattr(position, generator)():
+        position.make(move)
+        counts[move] = perft(position, depth - 1, generator)
+        position.unmake()
+    return counts
+
+
+@dataclass
+class PerftResult:
+    name: str
+    depth: int
+    nodes: int
+    seconds: float
+    expected: int = None
+
+    @property
+    def nps(self):
+        return self.nodes / self.seconds if self.seconds else 0.0
+
+    @property
+    def ok(self):
+        return self.expected is None or self.nodes == self.expected
+
+
+def run(perft_position, depth, generator='legal_moves'):
+    start = time.perf_counter()
+    nodes = perft(perft_position.position(), depth, generator)
+    expected = perft_position.expected[depth - 1] if depth <= len(perft_position.expected) else None
+    return PerftResult(perft_position.name, depth, nodes, time.perf_counter() - start, expected)
+
+
+def verify(max_depth=3, names=None, generator='legal_moves'):
+    """ Runs the suite up to max_depth, raising PerftMismatch on the first
+    wrong count. Returns every result. """
+    results = []
+    for perft_position in SUITE:
+        if names and perft_position.name not in names:
+            continue
+        for depth in range(1, min(max_depth, len(perft_position.expected)) + 1):
+            result = run(perft_position, depth, generator)
+            if not result.ok:
+                raise PerftMismatch(
+                    f'{result.name} depth {depth}: {result.nodes} nodes, expected {result.expected}'
+                )
+            results.append(result)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Move generation perft')
+    parser.add_argument('--position', '-p', choices=sorted(POSITIONS), action='append',
+                        help='position to count, the whole suite by default')
+    parser.add_argument('--depth', '-d', type=int, default=3)
+    parser.add_argument('--divide', action='store_true', help='count below every root move')
+    parser.add_argument('--generator', '-g', default='legal_moves',
+                        choices=['legal_moves', 'brute_force_moves'])
+    args = parser.parse_args(argv)
+
+    names = args.position or [p.name for p in SUITE]
+    failed = False
+    for name in names:
+        perft_position = POSITIONS[name]
+        if args.divide:
+            counts = divide(perft_position.position(), args.depth, args.generator)
+            for move, nodes in sorted(counts.items(), key=lambda item: move_name(item[0])):
+                print(f'{move_name(move):6} {nodes}')
+        result = run(perft_position, args.depth, args.generator)
+        status = '' if result.expected is None else ('ok' if result.ok else f'FAIL expected {result.expected}')
+        print(f'{result.name:12} depth {result.depth} {result.nodes:>10} nodes '
+              f'{result.seconds:8.2f}s {result.nps:>10.0f} nps {status}')
+        failed = failed or not result.ok
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
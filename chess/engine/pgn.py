@@ -0,0 +1,324 @@
+""" PGN: games as text, moves in standard algebraic notation (SAN).
+
+read_games streams games out of a file one at a time. Only the game being
+read is ever held, so collections of any size go through in constant
+memory. Comments, variations and NAGs are skipped, and every move is
+checked against the legal moves of the position, which is this project's
+rules: a game with en passant in it doesn't read.
+
+    python -m chess.engine.pgn games.pgn
+"""
+import re
+import sys
+import logging
+import argparse
+from pathlib import Path
+from array import array
+from dataclasses import dataclass, field
+from typing import Dict
+
+from chess.engine.encoding import (
+    WHITE, BLACK, PAWN, KING, FILES, TYPE_OF, move_list, square_name, parse_square
+)
+from chess.engine.fen import START_FEN, TYPE_LETTERS, PIECE_LETTERS, FenError, position_from_fen
+
+
+logger = logging.getLogger(Path(__file__).stem)
+
+# tags every game has, in this order
+ROSTER = ('Event', 'Site', 'Date', 'Round', 'White', 'Black', 'Result')
+RESULTS = ('1-0', '0-1', '1/2-1/2', '*')
+LINE_LENGTH = 80
+
+TAG = re.compile(r'^\[(\w+)\s+"((?:[^"\\]|\\.)*)"\]$')
+TOKEN = re.compile(r'\{[^}]*\}?|;[^\n]*|\(|\)|\$\d+|[^\s(){};]+')
+MOVE_NUMBER = re.compile(r'^\d+\.*')
+SAN = re.compile(r'^([KQRBN])?([a-h])?([1-8])?x?([a-h][1-8])(?:=?([QRBNqrbn]))?$')
+
+
+class PgnError(ValueError):
+    """ Text that doesn't read as a game """
+
+
+@dataclass
+class PgnGame:
+    tags: Dict[str, str] = field(default_factory=dict)
+    moves: array = field(default_factory=move_list)
+
+    @property
+    def result(self):
+        return self.tags.get('Result', '*')
+
+    @property
+    def fen(self):
+        """ FEN of the starting position """
+        return self.tags.get('FEN', START_FEN)
+
+    def position(self):
+        """ Starting position """
+        return position_from_fen(self.fen)
+
+    def final_position(self):
+        position = self.position()
+        for move in self.moves:
+            position.make(move)
+        return position
+
+
+def san(position, move, legal=None):
+    """ SAN of a legal move of position, check and mate marks included """
+    legal = position.legal_moves() if legal is None else legal
+    frm, to, promotion = move & 63, move >> 6 & 63, move >> 12
+    type = TYPE_OF[position.squares[frm]]
+    capture = bool(position.squares[to])
+    if type == KING and abs(to - frm) == 2:
+        text = 'O-O' if to > frm else 'O-O-O'
+    elif type == PAWN:
+        text = (FILES[frm % 8] + 'x' if capture else '') + square_name(to)
+        # a double push jumps over a pawn in front of it in this project,
+        # so two pawns of a file may push to the same square
+        if not capture and any(
+            other >> 6 & 63 == to and other & 63 != frm
+            and TYPE_OF[position.squares[other & 63]] == PAWN for other in legal
+        ):
+            text = square_name(frm) + text
+        if promotion:
+            text += '=' + TYPE_LETTERS[promotion].upper()
+    else:
+        # other pieces of the same type going to the same square
+        rivals = [
+            other & 63 for other in legal
+            if other >> 6 & 63 == to and other & 63 != frm
+            and TYPE_OF[position.squares[other & 63]] == type
+        ]
+        origin = ''
+        if rivals:
+            if all(sq % 8 != frm % 8 for sq in rivals):
+                origin = FILES[frm % 8]
+            elif all(sq // 8 != frm // 8 for sq in rivals):
+                origin = square_name(frm)[1]
+            else:
+                origin = square_name(frm)
+        text = TYPE_LETTERS[type].upper() + origin + ('x' if capture else '') + square_name(to)
+    position.make(move)
+    if position.check:
+        text += '#' if not position.legal_moves() else '+'
+    position.unmake()
+    return text
+
+
+def parse_san(position, text):
+    """ Legal move of position written text in SAN. Coordinate notation is
+    taken too """
+    text = text.rstrip('+#!?')
+    legal = position.legal_moves()
+    if text in ('O-O', 'O-O-O', '0-0', '0-0-0'):
+        long = text.count('-') == 2
+        for move in legal:
+            frm, to = move & 63, move >> 6 & 63
+            if TYPE_OF[position.squares[frm]] == KING and to - frm == (-2 if long else 2):
+                return move
+        raise PgnError(f'Castling {text} is not legal here')
+    match = SAN.match(text)
+    if match is None:
+        return _parse_coordinates(legal, text)
+    letter, file, rank, to, promotion = match.groups()
+    type = PIECE_LETTERS[letter.lower()] if letter else PAWN
+    to = parse_square(to)
+    promotion = PIECE_LETTERS[promotion.lower()] if promotion else 0
+    found = [
+        move for move in legal
+        if move >> 6 & 63 == to and move >> 12 == promotion
+        and TYPE_OF[position.squares[move & 63]] == type
+        and (file is None or FILES[(move & 63) % 8] == file)
+        and (rank is None or square_name(move & 63)[1] == rank)
+    ]
+    if len(found) != 1:
+        if not found and re.match(r'^[a-h][1-8][a-h][1-8][qrbn]?$', text):
+            return _parse_coordinates(legal, text)
+        raise PgnError(f'{text} is {"ambiguous" if found else "not legal"} here')
+    return found[0]
+
+
+def _parse_coordinates(legal, text):
+    names = {}
+    for move in legal:
+        promotion = move >> 12
+        name = square_name(move & 63) + square_name(move >> 6 & 63)
+        names[name + (TYPE_LETTERS[promotion] if promotion else '')] = move
+    if text.lower() not in names:
+        raise PgnError(f'Not a legal move here: {text!r}')
+    return names[text.lower()]
+
+
+def result_of(status_name, winner):
+    """ PGN result of a game status name and the winning color, if any """
+    if status_name == 'checkmate':
+        return '1-0' if winner == WHITE else '0-1'
+    if status_name == 'stalemate':
+        return '1/2-1/2'
+    return '*'
+
+
+def from_result(result, white='?', black='?', fen=None, **tags):
+    """ PgnGame of a headless game's GameResult """
+    game = PgnGame(
+        {'White': white, 'Black': black, 'Result': result_of(result.status.name, result.winner)},
+        move_list(result.moves)
+    )
+    if fen is not None and fen != START_FEN:
+        game.tags.update(SetUp='1', FEN=fen)
+    game.tags.update(tags)
+    return game
+
+
+def movetext(game):
+    """ Numbered SAN moves of game followed by its result """
+    position = game.position()
+    number = int(game.fen.split()[5]) if len(game.fen.split()) > 5 else 1
+    tokens = []
+    for i, move in enumerate(game.moves):
+        if position.turn == WHITE:
+            tokens.append(f'{number}.')
+        elif i == 0:
+            tokens.append(f'{number}...')
+        tokens.append(san(position, move))
+        if position.turn == BLACK:
+            number += 1
+        position.make(move)
+    tokens.append(game.result)
+    return tokens
+
+
+def format_game(game):
+    """ PGN text of a game, a blank line at the end """
+    tags = {tag: '?' for tag in ROSTER}
+    tags['Result'] = '*'
+    tags.update(game.tags)
+    ordered = list(ROSTER) + [tag for tag in tags if tag not in ROSTER]
+    lines = [f'[{tag} "{_escape(tags[tag])}"]' for tag in ordered]
+    lines.append('')
+    line = ''
+    for token in movetext(game):
+        if line and len(line) + 1 + len(token) > LINE_LENGTH:
+            lines.append(line)
+            line = token
+        else:
+            line = f'{line} {token}' if line else token
+    lines.append(line)
+    return '\n'.join(lines) + '\n\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"')
+
+
+def write_games(games, f):
+    """ Writes games to an open text file, returns how many """
+    count = 0
+    for game in games:
+        f.write(format_game(game))
+        count += 1
+    return count
+
+
+def _game(tags, text, number):
+    """ PgnGame out of the tags and movetext lines of the number-th game """
+    game = PgnGame(tags)
+    try:
+        position = game.position()
+    except FenError as e:
+        raise PgnError(f'Game {number}: {e}') from None
+    depth = 0
+    # joined by newlines, where ; comments end
+    for token in TOKEN.findall('\n'.join(text)):
+        if token == '(':
+            depth += 1
+        elif token == ')':
+            depth = max(depth - 1, 0)
+        elif depth or token[0] in '{;$':
+            continue
+        elif token in RESULTS:
+            game.tags.setdefault('Result', token)
+        else:
+            token = MOVE_NUMBER.sub('', token)
+            if not token:
+                continue
+            try:
+                move = parse_san(position, token)
+            except PgnError as e:
+                raise PgnError(f'Game {number}, ply {len(game.moves) + 1}: {e}') from None
+            game.moves.append(move)
+            position.make(move)
+    return game
+
+
+def read_games(lines, skip_errors=False):
+    """ Yields the games of an iterable of PGN lines (an open file) one at
+    a time. Games that don't read raise PgnError, or are logged and
+    skipped with skip_errors """
+    tags, text, number = {}, [], 0
+    for line in lines:
+        line = line.strip()
+        if line.startswith('[') and text:
+            # tags after movetext start the next game
+            number += 1
+            game = _read_one(tags, text, number, skip_errors)
+            if game is not None:
+                yield game
+            tags, text = {}, []
+        if line.startswith('['):
+            match = TAG.match(line)
+            if match is not None:
+                tags[match.group(1)] = re.sub(r'\\(.)', r'\1', match.group(2))
+        elif line and not line.startswith('%'):
+            text.append(line)
+    if tags or text:
+        game = _read_one(tags, text, number + 1, skip_errors)
+        if game is not None:
+            yield game
+
+
+def _read_one(tags, text, number, skip_errors):
+    try:
+        return _game(tags, text, number)
+    except PgnError:
+        if not skip_errors:
+            raise
+        logger.warning('Skipping game %d', number, exc_info=True)
+        return None
+
+
+def read_pgn(path, skip_errors=False):
+    """ Games of a PGN file, streamed """
+    with open(path, encoding='utf-8', errors='replace') as f:
+        yield from read_games(f, skip_errors)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Reads PGN files')
+    parser.add_argument('pgn')
+    parser.add_argument('--skip-errors', action='store_true', help='skip games that do not read')
+    parser.add_argument('--out', '-o', help='write the games back out here, checked and reformatted')
+    args = parser.parse_args(argv)
+
+    games = plies = 0
+    results = {result: 0 for result in RESULTS}
+    out = open(args.out, 'w') if args.out else None
+    try:
+        for game in read_pgn(args.pgn, args.skip_errors):
+            games += 1
+            plies += len(game.moves)
+            results[game.result if game.result in results else '*'] += 1
+            if out is not None:
+                out.write(format_game(game))
+    finally:
+        if out is not None:
+            out.close()
+    print(f'{games} games, {plies} plies: '
+          + ', '.join(f'{count} {result}' for result, count in results.items()))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,62 @@
+""" Colors, piece types and starting grids, free of any pygame import.
+
+A grid is an 8x8 list of cells, num * 100 + color * 10 + type for a piece
+and 0 for an empty square, row 0 being black's back rank.
+"""
+from collections import namedtuple
+from enum import Enum
+
+from chess.engine.encoding import COLOR_OF, TYPE_OF
+
+
+PieceId = namedtuple('PieceId', ['num', 'color', 'type'])
+
+
+class PieceType(Enum):
+    pawn = 1
+    rook = 2
+    knight = 3
+    bishop = 4
+    queen = 5
+    king = 6
+
+
+class Color(Enum):
+    black = 1
+    white = 2
+
+    @staticmethod
+    def next(color):
+        return Color.white if color == Color.black else Color.black
+
+
+# Color and PieceType members of every piece code, so grid cells
+# can be decoded without building enums
+CODE_COLOR = tuple(Color(color) if color else None for color in COLOR_OF)
+CODE_TYPE = tuple(PieceType(type) if type else None for type in TYPE_OF)
+
+
+def new_grid():
+    return [
+        [112, 113, 114, 115, 116, 214, 213, 212],
+        [111, 211, 311, 411, 511, 611, 711, 811],
+        [0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0],
+        [121, 221, 321, 421, 521, 621, 721, 821],
+        [122, 123, 124, 125, 126, 224, 223, 222]
+    ]
+
+
+def test_grid():
+    return [
+        [0, 0, 0, 0, 116, 0, 0, 0],
+        [0, 221, 321, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0],
+        [121, 0, 0, 421, 521, 621, 721, 821],
+        [122, 123, 124, 125, 126, 224, 223, 222]
+    ]
@@ -0,0 +1,353 @@
+""" Players for headless games. A player picks a packed move for the side
+to move of a Position and leaves the position as it found it.
+
+Search and tree players can ponder: after their move, ponder keeps
+searching on a thread as if the rival had already played the reply they
+expect. If the next choose is for that position (a ponder hit) the search
+carries on until the move's time is up, counting the time spent pondering,
+otherwise it's stopped and thrown away.
+
+Every player takes an opening book (see chess.engine.book) and plays out
+of it while it has moves for the position. Search and tree players also
+take a directory of endgame tables (see chess.engine.tablebase) and stop
+searching once there are few enough pieces left to look the move up.
+"""
+import time
+import logging
+import threading
+from random import Random
+from pathlib import Path
+from dataclasses import dataclass, replace
+
+from chess.engine.encoding import NO_MOVE, move_name
+from chess.engine.book import OpeningBook
+from chess.engine.tablebase import Tablebases, describe
+from chess.engine.search import Search, SearchLimits, MAX_DEPTH
+from chess.engine.mcts import TreeSearch, TreeLimits
+from chess.engine.transposition import TranspositionTable
+
+
+logger = logging.getLogger(Path(__file__).stem)
+
+# most playouts a tree player ponders for, about a minute's worth
+PONDER_PLAYOUTS = 20_000
+
+
+class PlayerFactory:
+    @staticmethod
+    def make(name):
+        return {
+            'random AI': RandomPlayer,
+            'search AI': SearchPlayer,
+            'mcts AI': MCTSPlayer
+        }[name]
+
+
+@dataclass
+class PonderStats:
+    ponders: int = 0
+    hits: int = 0
+    # thinking time the hits took off the clock
+    seconds_saved: float = 0.0
+
+    @property
+    def hit_rate(self):
+        return self.hits / self.ponders if self.ponders else 0.0
+
+    def __str__(self):
+        return f'ponder {self.hits}/{self.ponders} {self.seconds_saved:.1f}s saved'
+
+
+class Ponder:
+    """ A search running on a thread for the position after a predicted
+    reply, key being its hash """
+
+    def __init__(self, key, run, *args):
+        self.key = key
+        self.result = None
+        self.start = time.perf_counter()
+        self.thread = threading.Thread(target=self.target, args=(run, *args), daemon=True)
+        self.thread.start()
+
+    def target(self, run, *args):
+        self.result = run(*args)
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+    def join(self, timeout=None):
+        self.thread.join(timeout)
+        return self.result
+
+
+class EnginePlayer:
+    name = None
+    book = None
+    # picks between book moves
+    rng = Random()
+    # whether the last move came out of the book
+    from_book = False
+
+    def choose(self, position):
+        """ Packed move to play in position, promotion included """
+        raise NotImplementedError
+
+    def open_book(self, path):
+        """ Plays out of the book at path from now on, None for no book """
+        if self.book is not None:
+            self.book.close()
+        self.book = OpeningBook(path) if path is not None else None
+
+    def book_move(self, position):
+        """ A move of the book for position, NO_MOVE when out of book """
+        move = self.book.choose(position, self.rng) if self.book is not None else NO_MOVE
+        self.from_book = move != NO_MOVE
+        return move
+
+    def report(self):
+        """ One line about the last move chosen, for logs and consoles """
+        return 'book' if self.from_book else ''
+
+    def ponder(self, position):
+        """ Starts thinking on the rival's time, position being the one
+        after the player's own move. Does nothing unless the player can """
+
+    def stop(self):
+        """ Makes a choose running on another thread return early """
+
+    def close(self):
+        """ Frees whatever the player holds on to, e.g. worker processes """
+        self.open_book(None)
+
+
+class PonderingPlayer(EnginePlayer):
+    """ Base of the players that can ponder. Subclasses search with
+    think(position, limits), have the rival's expected reply in
+    predict(position) and keep their budget in limits """
+
+    def __init__(self, ponder=False, book=None, tablebases=None):
+        self.open_book(book)
+        self.tablebases = Tablebases(tablebases) if tablebases is not None else None
+        # move looked up in the tables, None if the last one was searched
+        self.looked_up = None
+        self.pondering = ponder
+        self.ponder_stats = PonderStats()
+        # ponder searches stop once it's set
+        self.stop_event = threading.Event()
+        self.running = None
+        self.last = None
+        self.last_hit = False
+
+    def think(self, position, limits):
+        raise NotImplementedError
+
+    def predict(self, position):
+        """ Rival's expected reply in position, NO_MOVE for no idea """
+        return NO_MOVE
+
+    def ponder_limits(self):
+        """ Budget of a ponder search, which runs until it's stopped """
+        return replace(self.limits, seconds=None)
+
+    def think_ahead(self, position, limits):
+        """ The search run while pondering """
+        return self.think(position, limits)
+
+    def ponder(self, position):
+        if not self.pondering or self.running is not None:
+            return
+        reply = self.predict(position)
+        if reply == NO_MOVE:
+            return
+        after = position.copy()
+        after.make(reply)
+        self.ponder_stats.ponders += 1
+        # searches until it's either a hit and the time is up, or stopped
+        self.running = Ponder(after.hash, self.think_ahead, after, self.ponder_limits())
+
+    def choose(self, position):
+        running, self.running = self.running, None
+        self.looked_up = None
+        # not a hit until the search says so: drop looks at it too
+        self.last, self.last_hit = None, False
+        move = self.book_move(position)
+        if move != NO_MOVE:
+            if running is not None:
+                self.drop(running)
+            logger.info('%s out of the book', move_name(move))
+            return move
+        self.looked_up = self.tablebases.best_move(position) if self.tablebases is not None else None
+        if self.looked_up is not None:
+            if running is not None:
+                self.drop(running)
+            logger.info('%s %s', move_name(self.looked_up.move), self.report())
+            return self.looked_up.move
+        self.last_hit = running is not None and running.key == position.hash
+        if self.last_hit:
+            self.last = self.ponder_hit(running)
+        else:
+            if running is not None:
+                self.drop(running)
+            self.last = self.think(position, self.limits)
+        logger.info('%s %s', move_name(self.last.move), self.report())
+        return self.last.move
+
+    def ponder_hit(self, running):
+        start = time.perf_counter()
+        seconds = self.limits.seconds
+        running.join(None if seconds is None else max(seconds - running.elapsed, 0.0))
+        result = self.drop(running)
+        waited = time.perf_counter() - start
+        # what a search from scratch would have taken, less the wait
+        searched = result.seconds if seconds is None else min(result.seconds, seconds)
+        self.ponder_stats.hits += 1
+        self.ponder_stats.seconds_saved += max(searched - waited, 0.0)
+        return result
+
+    def drop(self, running):
+        """ Stops a ponder search, returning what it found """
+        self.stop_event.set()
+        result = running.join()
+        self.stop_event.clear()
+        return result
+
+    def report(self):
+        if self.looked_up is not None:
+            return f'tablebase {describe(self.looked_up.value)}'
+        return super().report()
+
+    def ponder_report(self):
+        if not self.ponder_stats.ponders:
+            return ''
+        return f'{"hit, " if self.last_hit else ""}{self.ponder_stats}'
+
+    def close(self):
+        if self.running is not None:
+            self.drop(self.running)
+            self.running = None
+        if self.tablebases is not None:
+            self.tablebases.close()
+        super().close()
+
+
+class RandomPlayer(EnginePlayer):
+    name = 'random AI'
+
+    def __init__(self, seed=None, book=None):
+        self.rng = Random(seed)
+        self.open_book(book)
+
+    def choose(self, position):
+        return self.book_move(position) or self.rng.choice(position.legal_moves())
+
+
+class SearchPlayer(PonderingPlayer):
+    """ Alpha-beta search under a time and/or node budget per move. With
+    more than one worker the search runs on that many processes, started on
+    the first move and kept until the player is closed. Only a single
+    worker can ponder """
+    name = 'search AI'
+
+    def __init__(self, seconds=1.0, nodes=None, depth=MAX_DEPTH, table_mb=16, workers=1,
+                 ponder=False, book=None, tablebases=None):
+        super().__init__(ponder=ponder and workers == 1, book=book, tablebases=tablebases)
+        self.limits = SearchLimits(seconds, nodes, depth)
+        self.table_mb = table_mb
+        self.workers = workers
+        self.search = Search(TranspositionTable(table_mb), stop_event=self.stop_event) \
+            if workers == 1 else None
+
+    def think(self, position, limits):
+        if self.search is None:
+            # shared memory came with python 3.8, only pools need it
+            from chess.engine.parallel import SearchPool
+            self.search = SearchPool(self.workers, self.table_mb)
+        return self.search.run(position, limits)
+
+    def predict(self, position):
+        # the second move of the principal variation, if the first is the
+        # one played and it's still legal
+        pv = self.last.pv if self.last is not None else []
+        if len(pv) > 1 and pv[0] == self.last.move and pv[1] in position.legal_moves():
+            return pv[1]
+        return NO_MOVE
+
+    def report(self):
+        if self.last is None:
+            return super().report()
+        report = f'depth {self.last.depth} {self.last.nps / 1000:.1f}k nps'
+        return ' '.join(filter(None, (report, self.ponder_report())))
+
+    def stop(self):
+        if self.search is not None:
+            self.search.stop()
+
+    def close(self):
+        super().close()
+        if self.workers > 1 and self.search is not None:
+            self.search.close()
+            self.search = None
+
+
+class MCTSPlayer(PonderingPlayer):
+    """ Monte Carlo tree search, by playout count and/or time per move """
+    name = 'mcts AI'
+
+    def __init__(self, playouts=None, seconds=1.0, guided=True, seed=None, ponder=False,
+                 book=None, tablebases=None):
+        super().__init__(ponder=ponder, book=book, tablebases=tablebases)
+        self.limits = TreeLimits(playouts, seconds)
+        self.search = TreeSearch(guided=guided, seed=seed, stop_event=self.stop_event)
+        # the tree before pondering, to reuse it anyway after a miss
+        self.before_ponder = None
+
+    def think(self, position, limits):
+        return self.search.run(position, limits)
+
+    def ponder_limits(self):
+        # the tree would grow for as long as the rival thinks otherwise
+        playouts = self.limits.playouts
+        return replace(
+            self.limits, seconds=None,
+            playouts=PONDER_PLAYOUTS if playouts is None else min(playouts, PONDER_PLAYOUTS)
+        )
+
+    def think_ahead(self, position, limits):
+        # the predicted reply stays in the tree until it's a hit, so the
+        # playouts under it are counted all the way up if it's a miss
+        return self.search.run(position, limits, detach=False)
+
+    def predict(self, position):
+        # the reply with the most playouts under the move played
+        root = self.search.root
+        if root is None or root.key != position.hash or not root.children:
+            return NO_MOVE
+        return max(root.children, key=lambda child: child.visits).move
+
+    def ponder(self, position):
+        self.before_ponder = self.search.root
+        super().ponder(position)
+
+    def ponder_hit(self, running):
+        result = super().ponder_hit(running)
+        # the tree the ponder search grew out of can go now
+        node = self.before_ponder.find(running.key) if self.before_ponder is not None else None
+        if node is not None:
+            node.parent = None
+        return result
+
+    def drop(self, running):
+        result = super().drop(running)
+        if not self.last_hit:
+            self.search.root = self.before_ponder
+        return result
+
+    def report(self):
+        if self.last is None:
+            return super().report()
+        report = f'{self.last.playouts} playouts {self.last.reused} reused'
+        return ' '.join(filter(None, (report, self.ponder_report())))
+
+    def stop(self):
+        self.search.stop()
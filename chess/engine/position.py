@@ -0,0 +1,601 @@
+import logging
+from pathlib import Path
+
+from chess.engine.encoding import (
+    BLACK, WHITE, PAWN, ROOK, KNIGHT, BISHOP, QUEEN, KING, COLORS, PROMOTIONS,
+    COLOR_OF, TYPE_OF, OPPONENT, opponent, piece_code, square, move_list
+)
+from chess.engine.evaluation import (
+    PIECE_VALUES, MIDDLEGAME, ENDGAME, PHASE, check_score
+)
+from chess.engine.zobrist import PIECE_KEYS, CASTLING_KEYS, BLACK_TO_MOVE, zobrist_hash
+from chess.engine.tables import (
+    KNIGHT_ATTACKS, KING_ATTACKS, PAWN_PUSH, PAWN_DOUBLE, PAWN_CAPTURE, BETWEEN,
+    rook_attacks, bishop_attacks, queen_attacks
+)
+
+
+logger = logging.getLogger(Path(__file__).stem)
+
+FULL = 0xFFFF_FFFF_FFFF_FFFF
+
+# indexed by color
+HOME_ROW = (None, 0, 7)
+PROMOTION_ROW = (None, 7, 0)
+PROMOTION_SQUARES = (0, 0xFF << 56, 0xFF)
+LEFT_CASTLE = (0, 1, 4)
+RIGHT_CASTLE = (0, 2, 8)
+ALL_CASTLES = 15
+
+
+# piece values for exchanges, the king taken as priceless so it's never
+# worth putting it where it can be recaptured
+SEE_VALUES = PIECE_VALUES[:KING] + (20000,)
+
+
+def squares_of(bb):
+    """ Yields the index of every set bit, lowest first """
+    while bb:
+        low = bb & -bb
+        yield low.bit_length() - 1
+        bb ^= low
+
+
+class MoveGenerationMismatch(Exception):
+    """ legal_moves and brute_force_moves disagree on a position """
+
+
+def _castle_mask():
+    """ Castling rights kept when a move touches each square """
+    mask = [ALL_CASTLES] * 64
+    for color in COLORS:
+        row = HOME_ROW[color]
+        mask[square(row, 4)] &= ~(LEFT_CASTLE[color] | RIGHT_CASTLE[color])
+        mask[square(row, 0)] &= ~LEFT_CASTLE[color]
+        mask[square(row, 7)] &= ~RIGHT_CASTLE[color]
+    return mask
+
+
+CASTLE_MASK = _castle_mask()
+
+
+class Position:
+    """ Bitboard representation of a chess position. There is one 64 bit
+    board per piece code plus the occupancy of each color. A mailbox with
+    the piece code of every square is kept alongside for O(1) lookups. """
+
+    __slots__ = (
+        'boards', 'occupancy', 'squares', 'turn', 'castling', 'checked', 'stack',
+        'piece_attacks', 'hash', 'middlegame', 'endgame', 'phase'
+    )
+
+    def __init__(self, turn=WHITE, castling=0):
+        self.boards = [0] * 27
+        self.occupancy = [0, 0, 0]
+        self.squares = [0] * 64
+        self.turn = turn
+        self.castling = castling
+        # whether the side to move is in check, None until asked for
+        self.checked = None
+        # undo information of every move made, see make/unmake
+        self.stack = []
+        # squares attacked by the piece standing on each square. The list is
+        # replaced, never modified, so undoing a move just puts the old one back
+        self.piece_attacks = [0] * 64
+        # zobrist hash, kept up to date by every change to the position
+        self.hash = CASTLING_KEYS[castling] ^ (BLACK_TO_MOVE if turn == BLACK else 0)
+        # evaluation terms, white's point of view, kept up to date like the
+        # hash. See chess.engine.evaluation
+        self.middlegame = 0
+        self.endgame = 0
+        self.phase = 0
+
+    @classmethod
+    def from_grid(cls, grid, turn=WHITE, castling=None):
+        """ Build a position out of a Board grid. When castling rights are
+        not given they are granted to every king and rook on its
+        starting square, and given ones are only kept for those """
+        position = cls(turn=turn)
+        for row in range(8):
+            for col in range(8):
+                cell = int(grid[row][col])
+                if cell:
+                    position.put(square(row, col), cell % 100)
+        possible = 0
+        for color in COLORS:
+            row = HOME_ROW[color]
+            if position.squares[square(row, 4)] != piece_code(color, KING):
+                continue
+            rook = piece_code(color, ROOK)
+            if position.squares[square(row, 0)] == rook:
+                possible |= LEFT_CASTLE[color]
+            if position.squares[square(row, 7)] == rook:
+                possible |= RIGHT_CASTLE[color]
+        position.castling = possible if castling is None else castling & possible
+        position.hash = zobrist_hash(position)
+        position.refresh_attacks()
+        return position
+
+    def copy(self):
+        position = Position(self.turn, self.castling)
+        position.boards = self.boards[:]
+        position.occupancy = self.occupancy[:]
+        position.squares = self.squares[:]
+        position.checked = self.checked
+        position.stack = self.stack[:]
+        position.piece_attacks = self.piece_attacks
+        position.hash = self.hash
+        position.middlegame = self.middlegame
+        position.endgame = self.endgame
+        position.phase = self.phase
+        return position
+
+    def put(self, sq, code):
+        bit = 1 << sq
+        self.boards[code] |= bit
+        self.occupancy[COLOR_OF[code]] |= bit
+        self.squares[sq] = code
+        self.hash ^= PIECE_KEYS[code][sq]
+        self.middlegame += MIDDLEGAME[code][sq]
+        self.endgame += ENDGAME[code][sq]
+        self.phase += PHASE[code]
+
+    def remove(self, sq):
+        code = self.squares[sq]
+        if code:
+            bit = 1 << sq
+            self.boards[code] ^= bit
+            self.occupancy[COLOR_OF[code]] ^= bit
+            self.squares[sq] = 0
+            self.hash ^= PIECE_KEYS[code][sq]
+            self.middlegame -= MIDDLEGAME[code][sq]
+            self.endgame -= ENDGAME[code][sq]
+            self.phase -= PHASE[code]
+        return code
+
+    def piece_at(self, sq):
+        return self.squares[sq]
+
+    def key(self):
+        """ Identity of the position: pieces, side to move and castling
+        rights, folded into the zobrist hash """
+        return self.hash
+
+    @property
+    def occupied(self):
+        return self.occupancy[BLACK] | self.occupancy[WHITE]
+
+    def king_square(self, color):
+        king = self.boards[piece_code(color, KING)]
+        return king.bit_length() - 1 if king else None
+
+    def reach(self, sq, occupied):
+        """ Squares attacked by the piece standing on sq """
+        code = self.squares[sq]
+        type = TYPE_OF[code]
+        if type == PAWN:
+            return PAWN_CAPTURE[COLOR_OF[code]][sq]
+        if type == KNIGHT:
+            return KNIGHT_ATTACKS[sq]
+        if type == KING:
+            return KING_ATTACKS[sq]
+        if type == ROOK:
+            return rook_attacks(sq, occupied)
+        if type == BISHOP:
+            return bishop_attacks(sq, occupied)
+        return queen_attacks(sq, occupied)
+
+    def refresh_attacks(self):
+        """ Recomputes the attack set of every piece from scratch """
+        occupied = self.occupied
+        self.piece_attacks = [
+            self.reach(sq, occupied) if code else 0
+            for sq, code in enumerate(self.squares)
+        ]
+
+    def update_attacks(self, changed):
+        """ Brings piece_attacks up to date after the squares in the changed
+        bitboard were emptied or filled: pieces landing there get new attack
+        sets, and so does every slider with a ray over one of them """
+        boards = self.boards
+        squares = self.squares
+        occupied = self.occupied
+        rooks = bishops = 0
+        for base in (BLACK * 10, WHITE * 10):
+            queens = boards[base + QUEEN]
+            rooks |= boards[base + ROOK] | queens
+            bishops |= boards[base + BISHOP] | queens
+        attacks = self.piece_attacks[:]
+        stale = changed & occupied
+        for sq in squares_of(changed):
+            if not squares[sq]:
+                attacks[sq] = 0
+            stale |= (rook_attacks(sq, occupied) & rooks) | (bishop_attacks(sq, occupied) & bishops)
+        for sq in squares_of(stale):
+            attacks[sq] = self.reach(sq, occupied)
+        self.piece_attacks = attacks
+
+    def attack_map(self, color):
+        """ Every square attacked by color, out of the maintained attack sets """
+        attacks = 0
+        piece_attacks = self.piece_attacks
+        for sq in squares_of(self.occupancy[color]):
+            attacks |= piece_attacks[sq]
+        return attacks
+
+    def attacks(self, color, occupied=None):
+        """ Every square attacked by color computed from scratch, sliders
+        seeing through anything missing from occupied """
+        boards = self.boards
+        occupied = self.occupied if occupied is None else occupied
+        base = color * 10
+        attacks = 0
+
+        pawn_capture = PAWN_CAPTURE[color]
+        for sq in squares_of(boards[base + PAWN]):
+            attacks |= pawn_capture[sq]
+        for sq in squares_of(boards[base + KNIGHT]):
+            attacks |= KNIGHT_ATTACKS[sq]
+        for sq in squares_of(boards[base + KING]):
+            attacks |= KING_ATTACKS[sq]
+        queens = boards[base + QUEEN]
+        for sq in squares_of(boards[base + ROOK] | queens):
+            attacks |= rook_attacks(sq, occupied)
+        for sq in squares_of(boards[base + BISHOP] | queens):
+            attacks |= bishop_attacks(sq, occupied)
+        return attacks
+
+    def attackers(self, sq, color, occupied=None):
+        """ Pieces of color attacking sq, found by looking outwards from sq """
+        boards = self.boards
+        occupied = self.occupied if occupied is None else occupied
+        base = color * 10
+        queens = boards[base + QUEEN]
+        return (
+            (PAWN_CAPTURE[opponent(color)][sq] & boards[base + PAWN])
+            | (KNIGHT_ATTACKS[sq] & boards[base + KNIGHT])
+            | (KING_ATTACKS[sq] & boards[base + KING])
+            | (rook_attacks(sq, occupied) & (boards[base + ROOK] | queens))
+            | (bishop_attacks(sq, occupied) & (boards[base + BISHOP] | queens))
+        )
+
+    def see(self, move):
+        """ Static exchange evaluation: material won by the side making move
+        once every capture on its target square has been played out, the
+        cheapest attacker capturing first and either side free to stop.
+        Sliders lined up behind the capturers join in. Nothing is moved """
+        frm, to, promotion = move & 63, move >> 6 & 63, move >> 12
+        squares = self.squares
+        boards = self.boards
+        gains = [SEE_VALUES[TYPE_OF[squares[to]]]]
+        # value of the piece standing on the square, up for grabs next
+        on_square = SEE_VALUES[TYPE_OF[squares[frm]]]
+        if promotion:
+            gains[0] += SEE_VALUES[promotion] - SEE_VALUES[PAWN]
+            on_square = SEE_VALUES[promotion]
+        occupied = self.occupied ^ (1 << frm)
+        color = OPPONENT[COLOR_OF[squares[frm]]]
+        while True:
+            attackers = self.attackers(to, color, occupied) & occupied
+            if not attackers:
+                break
+            # least valuable attacker
+            for type in (PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING):
+                pieces = attackers & boards[color * 10 + type]
+                if pieces:
+                    break
+            gains.append(on_square - gains[-1])
+            on_square = SEE_VALUES[type]
+            occupied ^= pieces & -pieces
+            color = OPPONENT[color]
+        # each side only keeps capturing while it pays off
+        while len(gains) > 1:
+            last = gains.pop()
+            gains[-1] = -max(-gains[-1], last)
+        return gains[0]
+
+    def hanging(self, color):
+        """ Squares of pieces of color the rival wins material capturing.
+        A king under attack is in check, not hanging """
+        rival = OPPONENT[color]
+        hanging = []
+        for sq in squares_of(self.occupancy[color] & ~self.boards[color * 10 + KING]):
+            for attacker in squares_of(self.attackers(sq, rival)):
+                if self.see(attacker | sq << 6) > 0:
+                    hanging.append(sq)
+                    break
+        return hanging
+
+    def pins(self, color):
+        """ Pieces of color pinned against their king, mapped to the squares
+        they may still move to: the pin ray, pinner included """
+        king = self.king_square(color)
+        rival = opponent(color)
+        base = rival * 10
+        boards = self.boards
+        own = self.occupancy[color]
+        occupied = own | self.occupancy[rival]
+        queens = boards[base + QUEEN]
+        # rival sliders seeing the king through pieces of color
+        pinners = (
+            (rook_attacks(king, self.occupancy[rival]) & (boards[base + ROOK] | queens))
+            | (bishop_attacks(king, self.occupancy[rival]) & (boards[base + BISHOP] | queens))
+        )
+        pinned = {}
+        for pinner in squares_of(pinners):
+            between = BETWEEN[king][pinner]
+            blockers = between & occupied
+            if blockers and blockers & (blockers - 1) == 0 and blockers & own:
+                pinned[blockers.bit_length() - 1] = between | (1 << pinner)
+        return pinned
+
+    def is_attacked(self, sq, color):
+        """ Whether color attacks sq """
+        return bool(self.attackers(sq, color))
+
+    def in_check(self, color):
+        if color == self.turn:
+            return self.check
+        return self._attacked_king(color)
+
+    def _attacked_king(self, color):
+        king = self.king_square(color)
+        return king is not None and self.is_attacked(king, opponent(color))
+
+    @property
+    def check(self):
+        """ Whether the side to move is in check, cached until the next move """
+        if self.checked is None:
+            self.checked = self._attacked_king(self.turn)
+        return self.checked
+
+    def piece_moves(self, sq):
+        """ Pseudo legal destinations of the piece standing on sq """
+        code = self.squares[sq]
+        color, type = COLOR_OF[code], TYPE_OF[code]
+        own = self.occupancy[color]
+        rivals = self.occupancy[OPPONENT[color]]
+        occupied = own | rivals
+
+        if type == PAWN:
+            targets = PAWN_CAPTURE[color][sq] & rivals
+            targets |= PAWN_PUSH[color][sq] & ~occupied
+            # first move may be two squares forward, as long
+            # as the landing square is free
+            targets |= PAWN_DOUBLE[color][sq] & ~occupied
+            return targets
+        if type == KNIGHT:
+            targets = KNIGHT_ATTACKS[sq]
+        elif type == KING:
+            targets = KING_ATTACKS[sq]
+        elif type == ROOK:
+            targets = rook_attacks(sq, occupied)
+        elif type == BISHOP:
+            targets = bishop_attacks(sq, occupied)
+        else:
+            targets = queen_attacks(sq, occupied)
+        return targets & ~own
+
+    def _add_moves(self, moves, sq, targets):
+        """ Packs the moves from sq to every square in targets. A pawn
+        reaching its last row gets a move per promotion """
+        promoting = targets & PROMOTION_SQUARES[COLOR_OF[self.squares[sq]]]
+        if promoting and TYPE_OF[self.squares[sq]] == PAWN:
+            for to in squares_of(targets):
+                for promotion in PROMOTIONS:
+                    moves.append(sq | to << 6 | promotion << 12)
+        else:
+            for to in squares_of(targets):
+                moves.append(sq | to << 6)
+
+    def pseudo_moves(self, color):
+        moves = move_list()
+        for sq in squares_of(self.occupancy[color]):
+            self._add_moves(moves, sq, self.piece_moves(sq))
+        return moves
+
+    def castle_squares(self, color, attacked=None):
+        """ Squares the king walks through for a left and right castle,
+        empty lists if that castle is not possible """
+        if not self.castling & (LEFT_CASTLE[color] | RIGHT_CASTLE[color]):
+            return [], []
+        king = self.king_square(color)
+        if king is None or self.in_check(color):
+            return [], []
+        if attacked is None:
+            attacked = self.attack_map(opponent(color))
+        castles = []
+        for right, step in ((LEFT_CASTLE[color], -1), (RIGHT_CASTLE[color], 1)):
+            path = [king + step, king + step * 2]
+            if not self.castling & right or any(self.squares[sq] for sq in path) \
+                    or any(attacked >> sq & 1 for sq in path):
+                castles.append([])
+            else:
+                castles.append(path)
+        return tuple(castles)
+
+    def legal_moves(self, color=None):
+        """ Legal moves of color. Checkers and pins are worked out once, so
+        every move coming out of here is legal without trying it out """
+        color = self.turn if color is None else color
+        king = self.king_square(color)
+        if king is None:
+            return self.pseudo_moves(color)
+        rival = OPPONENT[color]
+        own = self.occupancy[color]
+        king_bit = 1 << king
+
+        checkers = self.attackers(king, rival)
+        attacked = self.attack_map(rival)
+        # the king can't hide behind itself from a slider checking it
+        sliders = checkers & ~self.boards[rival * 10 + PAWN] & ~self.boards[rival * 10 + KNIGHT]
+        if sliders:
+            occupied = self.occupied ^ king_bit
+            for sq in squares_of(sliders):
+                attacked |= self.reach(sq, occupied)
+        moves = move_list()
+        self._add_moves(moves, king, KING_ATTACKS[king] & ~own & ~attacked)
+
+        if checkers & (checkers - 1):
+            # double check, only the king may move
+            return moves
+        if checkers:
+            # capture the checker or block its ray
+            checker = checkers.bit_length() - 1
+            target = checkers | BETWEEN[king][checker]
+        else:
+            target = FULL
+            for path in self.castle_squares(color, attacked):
+                if path:
+                    moves.append(king | path[-1] << 6)
+
+        pinned = self.pins(color)
+        for sq in squares_of(own ^ king_bit):
+            targets = self.piece_moves(sq) & target
+            if sq in pinned:
+                targets &= pinned[sq]
+            self._add_moves(moves, sq, targets)
+        return moves
+
+    def brute_force_moves(self, color=None):
+        """ Legal moves of color found by trying every pseudo legal move out.
+        Slow, kept around as a reference for legal_moves """
+        color = self.turn if color is None else color
+        moves = move_list()
+        for move in self.pseudo_moves(color):
+            self.make(move)
+            if not self._attacked_king(color):
+                moves.append(move)
+            self.unmake()
+        king = self.king_square(color)
+        for path in self.castle_squares(color):
+            if path:
+                moves.append(king | path[-1] << 6)
+        return moves
+
+    def promotion_square(self, color):
+        """ Square of a pawn of color waiting to be promoted, if any """
+        pawns = self.boards[piece_code(color, PAWN)] & (0xFF << PROMOTION_ROW[color] * 8)
+        return pawns.bit_length() - 1 if pawns else None
+
+    def is_castle(self, frm, to):
+        return TYPE_OF[self.squares[frm]] == KING and abs(to - frm) == 2
+
+    @staticmethod
+    def castle_rook(frm, to):
+        """ From and to squares of the rook when the king castles frm -> to """
+        row = frm // 8
+        if to > frm:
+            return square(row, 7), to - 1
+        return square(row, 0), to + 1
+
+    def relocate(self, frm, to):
+        """ Moves a piece to an empty square. No rights, turn or history
+        bookkeeping whatsoever """
+        bit = (1 << frm) | (1 << to)
+        code = self.squares[frm]
+        self.boards[code] ^= bit
+        self.occupancy[COLOR_OF[code]] ^= bit
+        self.squares[frm], self.squares[to] = 0, code
+        keys = PIECE_KEYS[code]
+        self.hash ^= keys[frm] ^ keys[to]
+        self.middlegame += MIDDLEGAME[code][to] - MIDDLEGAME[code][frm]
+        self.endgame += ENDGAME[code][to] - ENDGAME[code][frm]
+
+    def make(self, move):
+        """ Plays a packed move in place, rook included when castling, and
+        passes the turn """
+        frm, to, promotion = move & 63, move >> 6 & 63, move >> 12
+        code = self.squares[frm]
+        captured = self.squares[to]
+        self.stack.append((
+            frm, to, code, captured, self.castling, self.checked, self.turn,
+            self.piece_attacks, self.hash
+        ))
+        changed = (1 << frm) | (1 << to)
+        if captured:
+            self.remove(to)
+        if TYPE_OF[code] == KING and abs(to - frm) == 2:
+            rook_from, rook_to = self.castle_rook(frm, to)
+            self.relocate(rook_from, rook_to)
+            changed |= (1 << rook_from) | (1 << rook_to)
+        if promotion:
+            self.remove(frm)
+            self.put(to, piece_code(COLOR_OF[code], promotion))
+        else:
+            self.relocate(frm, to)
+        if self.castling:
+            castling = self.castling & CASTLE_MASK[frm] & CASTLE_MASK[to]
+            self.hash ^= CASTLING_KEYS[self.castling] ^ CASTLING_KEYS[castling]
+            self.castling = castling
+        turn = OPPONENT[COLOR_OF[code]]
+        if turn != self.turn:
+            self.hash ^= BLACK_TO_MOVE
+            self.turn = turn
+        self.checked = None
+        self.update_attacks(changed)
+        return captured
+
+    def unmake(self):
+        """ Takes back the last move made """
+        frm, to, code, captured, self.castling, self.checked, self.turn, \
+            self.piece_attacks, zobrist = self.stack.pop()
+        if self.squares[to] == code:
+            self.relocate(to, frm)
+        else:
+            # promoted piece
+            self.remove(to)
+            self.put(frm, code)
+        if TYPE_OF[code] == KING and abs(to - frm) == 2:
+            rook_from, rook_to = self.castle_rook(frm, to)
+            self.relocate(rook_to, rook_from)
+        if captured:
+            self.put(to, captured)
+        self.hash = zobrist
+
+    def promote(self, sq, type):
+        """ Turns the pawn on sq into type, on top of the move that took
+        it there. Taking back that move brings the pawn back. """
+        color = COLOR_OF[self.remove(sq)]
+        self.put(sq, piece_code(color, type))
+        self.checked = None
+        self.update_attacks(1 << sq)
+
+
+def check_parity(position, depth):
+    """ Walks every line depth plies deep comparing legal_moves against
+    brute_force_moves, and the maintained attack maps, hash and evaluation
+    terms against freshly computed ones. Returns the number of positions
+    compared. """
+    moves = position.legal_moves()
+    expected = position.brute_force_moves()
+    if sorted(moves) != sorted(expected):
+        raise MoveGenerationMismatch(
+            f'{sorted(set(moves) ^ set(expected))!r} after {position.stack!r}'
+        )
+    if position.hash != zobrist_hash(position):
+        raise MoveGenerationMismatch(f'Stale hash after {position.stack!r}')
+    check_score(position)
+    for color in COLORS:
+        if position.attack_map(color) != position.attacks(color):
+            raise MoveGenerationMismatch(
+                f'Stale attack map for color {color} after {position.stack!r}'
+            )
+    compared = 1
+    if depth > 1:
+        for move in moves:
+            position.make(move)
+            compared += check_parity(position, depth - 1)
+            position.unmake()
+    return compared
+
+
+def position_state(position):
+    """ What a worker needs to rebuild position: pieces, turn and rights """
+    return position.squares[:], position.turn, position.castling
+
+
+def position_from_state(state):
+    squares, turn, castling = state
+    grid = [squares[row * 8:row * 8 + 8] for row in range(8)]
+    return Position.from_grid(grid, turn=turn, castling=castling)
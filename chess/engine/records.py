@@ -0,0 +1,302 @@
+""" Game records: games as packed 16-bit moves in a binary file, read
+through mmap.
+
+A records file is a header followed by games, each a small fixed header,
+the starting FEN when the game didn't start from the usual position, and
+its moves as they are packed everywhere else, two bytes a ply. Next to it
+sits an index file of 8 byte offsets, one per game, so game K is found
+without reading the K games before it.
+
+Writers only ever append, a whole game at a time under an exclusive
+flock of the records file, so any number of processes can write to the
+same archive. An index left behind by a writer that died halfway can be
+rebuilt out of the records file with reindex.
+
+    python -m chess.engine.records import games.pgn games.rec
+    python -m chess.engine.records export games.rec games.pgn
+    python -m chess.engine.records show games.rec 42
+"""
+import os
+import sys
+import mmap
+import struct
+import logging
+import argparse
+from pathlib import Path
+from array import array
+from dataclasses import dataclass, field
+
+from chess.engine.encoding import move_list, move_name
+from chess.engine.fen import START_FEN, position_from_fen
+from chess.engine.pgn import RESULTS, PgnGame, result_of, read_pgn, write_games
+
+try:
+    import fcntl
+except ImportError:
+    # no flock on windows, keep to one writer there
+    fcntl = None
+
+
+logger = logging.getLogger(Path(__file__).stem)
+
+MAGIC = b'CGR1'
+# magic, version
+HEADER = struct.Struct('<4sI')
+VERSION = 1
+# plies, result (an index into RESULTS), length of the starting FEN
+GAME = struct.Struct('<IBxH')
+OFFSET = struct.Struct('<Q')
+# array('H') is in the machine's byte order, files are little endian
+SWAP = sys.byteorder != 'little'
+
+
+class RecordError(Exception):
+    """ The file is not a records file, or it's broken """
+
+
+def index_path(path):
+    return Path(str(path) + '.idx')
+
+
+@dataclass
+class GameRecord:
+    moves: array = field(default_factory=move_list)
+    result: str = '*'
+    fen: str = START_FEN
+
+    def position(self):
+        """ Starting position """
+        return position_from_fen(self.fen)
+
+    def final_position(self):
+        position = self.position()
+        for move in self.moves:
+            position.make(move)
+        return position
+
+    def pgn(self, **tags) -> PgnGame:
+        game = PgnGame({'Result': self.result, **tags}, move_list(self.moves))
+        if self.fen != START_FEN:
+            game.tags.update(SetUp='1', FEN=self.fen)
+        return game
+
+    @classmethod
+    def from_pgn(cls, game: PgnGame):
+        return cls(move_list(game.moves), game.result if game.result in RESULTS else '*', game.fen)
+
+    @classmethod
+    def from_result(cls, result, fen=START_FEN):
+        """ Record of a headless game's GameResult """
+        return cls(move_list(result.moves), result_of(result.status.name, result.winner), fen)
+
+
+def pack(record: GameRecord) -> bytes:
+    """ Bytes of a game in a records file """
+    fen = b'' if record.fen == START_FEN else record.fen.encode('ascii')
+    moves = move_list(record.moves)
+    if SWAP:
+        moves.byteswap()
+    return GAME.pack(len(moves), RESULTS.index(record.result), len(fen)) + fen + moves.tobytes()
+
+
+def unpack(data, offset) -> GameRecord:
+    """ Game starting at offset of a records file's bytes """
+    plies, result, fen_length = GAME.unpack_from(data, offset)
+    start = offset + GAME.size
+    if result >= len(RESULTS) or start + fen_length + plies * 2 > len(data):
+        raise RecordError(f'No game at offset {offset}')
+    fen = bytes(data[start:start + fen_length]).decode('ascii') if fen_length else START_FEN
+    start += fen_length
+    moves = move_list()
+    moves.frombytes(data[start:start + plies * 2])
+    if SWAP:
+        moves.byteswap()
+    return GameRecord(moves, RESULTS[result], fen)
+
+
+class RecordWriter:
+    """ Appends games to a records file and its index. Safe to share a file
+    between processes, each with its own writer """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.data = open(self.path, 'ab')
+        self.index = open(index_path(self.path), 'ab')
+
+    def append(self, record: GameRecord):
+        """ Writes a game, returns its offset """
+        blob = pack(record)
+        if fcntl is not None:
+            fcntl.flock(self.data, fcntl.LOCK_EX)
+        try:
+            offset = self.data.seek(0, os.SEEK_END)
+            if offset == 0:
+                self.data.write(HEADER.pack(MAGIC, VERSION))
+                offset = HEADER.size
+            self.data.write(blob)
+            self.data.flush()
+            # the game is in before it's indexed, readers never see an
+            # offset with nothing behind it
+            self.index.write(OFFSET.pack(offset))
+            self.index.flush()
+        finally:
+            if fcntl is not None:
+                fcntl.flock(self.data, fcntl.LOCK_UN)
+        return offset
+
+    def close(self):
+        self.data.close()
+        self.index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def append_games(path, records):
+    """ Appends records to path, returns how many """
+    with RecordWriter(path) as writer:
+        count = 0
+        for record in records:
+            writer.append(record)
+            count += 1
+    return count
+
+
+class GameRecords:
+    """ A records file and its index mapped into memory, a sequence of
+    GameRecord. Games appended after opening aren't seen until it's opened
+    again. Close it, or use it as a context manager, to unmap it """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.data = self.offsets = None
+        with open(self.path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size < HEADER.size:
+                raise RecordError(f'{self.path} is too short to be a records file')
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version = HEADER.unpack_from(self.data)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise RecordError(f'{self.path} is not a records file, or not version {VERSION}')
+        with open(index_path(self.path), 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size:
+                self.offsets = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        # a torn last entry belongs to a writer still at it, or a dead one
+        self.count = size // OFFSET.size
+
+    def __len__(self):
+        return self.count
+
+    def offset(self, k):
+        return OFFSET.unpack_from(self.offsets, k * OFFSET.size)[0]
+
+    def __getitem__(self, k) -> GameRecord:
+        if k < 0:
+            k += self.count
+        if not 0 <= k < self.count:
+            raise IndexError(f'Game {k} of {self.count}')
+        return unpack(self.data, self.offset(k))
+
+    def __iter__(self):
+        for k in range(self.count):
+            yield self[k]
+
+    def close(self):
+        if self.data is not None:
+            self.data.close()
+        if self.offsets is not None:
+            self.offsets.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def reindex(path):
+    """ Rebuilds the index of a records file by walking its games, returns
+    how many there are. Bytes past the last whole game are cut off """
+    path = Path(path)
+    with open(path, 'r+b') as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        data = f.read()
+        if data[:HEADER.size] != HEADER.pack(MAGIC, VERSION):
+            raise RecordError(f'{path} is not a records file')
+        offsets = array('Q')
+        offset = HEADER.size
+        while offset + GAME.size <= len(data):
+            plies, result, fen_length = GAME.unpack_from(data, offset)
+            end = offset + GAME.size + fen_length + plies * 2
+            if result >= len(RESULTS) or end > len(data):
+                break
+            offsets.append(offset)
+            offset = end
+        if offset < len(data):
+            logger.warning('%s: cutting %d bytes after the last game', path, len(data) - offset)
+            f.truncate(offset)
+        with open(index_path(path), 'wb') as index:
+            index.write(b''.join(OFFSET.pack(o) for o in offsets))
+    return len(offsets)
+
+
+def import_pgn(pgn_path, path, skip_errors=False):
+    """ Appends the games of a PGN file to a records file, returns how many """
+    return append_games(path, (GameRecord.from_pgn(game) for game in read_pgn(pgn_path, skip_errors)))
+
+
+def export_pgn(path, pgn_path):
+    """ Writes the games of a records file out as PGN, returns how many """
+    with GameRecords(path) as records, open(pgn_path, 'w') as f:
+        return write_games(
+            (record.pgn(Round=str(k + 1)) for k, record in enumerate(records)), f
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Binary game records')
+    commands = parser.add_subparsers(dest='command', required=True)
+    import_parser = commands.add_parser('import', help='append the games of a PGN file')
+    import_parser.add_argument('pgn')
+    import_parser.add_argument('records')
+    import_parser.add_argument('--skip-errors', action='store_true')
+    export_parser = commands.add_parser('export', help='write the games out as PGN')
+    export_parser.add_argument('records')
+    export_parser.add_argument('pgn')
+    show_parser = commands.add_parser('show', help='moves of one game, or a summary')
+    show_parser.add_argument('records')
+    show_parser.add_argument('game', type=int, nargs='?')
+    reindex_parser = commands.add_parser('reindex', help='rebuild the index')
+    reindex_parser.add_argument('records')
+    args = parser.parse_args(argv)
+
+    if args.command == 'import':
+        print(f'{import_pgn(args.pgn, args.records, args.skip_errors)} games appended to {args.records}')
+    elif args.command == 'export':
+        print(f'{export_pgn(args.records, args.pgn)} games written to {args.pgn}')
+    elif args.command == 'reindex':
+        print(f'{reindex(args.records)} games indexed')
+    else:
+        with GameRecords(args.records) as records:
+            if args.game is None:
+                results = {result: 0 for result in RESULTS}
+                plies = 0
+                for record in records:
+                    results[record.result] += 1
+                    plies += len(record.moves)
+                print(f'{len(records)} games, {plies} plies: '
+                      + ', '.join(f'{count} {result}' for result, count in results.items()))
+            else:
+                record = records[args.game]
+                print(f'{record.fen} {record.result}')
+                print(' '.join(move_name(move) for move in record.moves))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
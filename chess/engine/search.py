@@ -0,0 +1,278 @@
+""" Negamax alpha-beta search with iterative deepening.
+
+Every iteration searches one ply deeper than the last, starting with the
+best root move found so far, until the time or node budget runs out. The
+move returned is the best one of the deepest iteration, or of the one cut
+short if it already found a better move there.
+
+Leaves are not evaluated straight away: a quiescence search keeps playing
+captures that don't lose material (by SEE) and queen promotions until the
+position is quiet, so the evaluation never sees half an exchange.
+"""
+import time
+import logging
+from random import Random
+from pathlib import Path
+from dataclasses import dataclass, field
+from typing import Optional, List
+
+from chess.engine.encoding import NO_MOVE, QUEEN
+from chess.engine.evaluation import evaluate
+from chess.engine.ordering import MoveOrderer
+from chess.engine.transposition import TranspositionTable, EXACT, LOWER, UPPER
+
+
+logger = logging.getLogger(Path(__file__).stem)
+
+INFINITY = 32000
+MATE = 30000
+# scores past this are mates, stored relative to the node in the table
+MATE_BOUND = MATE - 1000
+MAX_DEPTH = 64
+# limits are checked every this many nodes (minus one, it's a mask)
+CHECK_EVERY = 1023
+
+
+class SearchTimeout(Exception):
+    """ The search ran out of time or nodes, or was stopped """
+
+
+@dataclass
+class SearchLimits:
+    # None for no limit
+    seconds: Optional[float] = 1.0
+    nodes: Optional[int] = None
+    depth: int = MAX_DEPTH
+
+
+@dataclass
+class SearchResult:
+    move: int
+    score: int
+    # deepest iteration completed
+    depth: int
+    nodes: int
+    seconds: float
+    pv: List[int] = field(default_factory=list)
+
+    @property
+    def nps(self):
+        return self.nodes / self.seconds if self.seconds else 0.0
+
+
+def to_table(score, ply):
+    """ Mate scores are stored as distance from the node, not the root """
+    if score >= MATE_BOUND:
+        return score + ply
+    if score <= -MATE_BOUND:
+        return score - ply
+    return score
+
+
+def from_table(score, ply):
+    if score >= MATE_BOUND:
+        return score - ply
+    if score <= -MATE_BOUND:
+        return score + ply
+    return score
+
+
+class Search:
+    def __init__(self, table=None, evaluate=evaluate, ordering=True, stop_event=None, helper=0):
+        self.table = table if table is not None else TranspositionTable()
+        self.evaluate = evaluate
+        # without ordering moves are searched as they are generated, only
+        # useful to measure what ordering buys
+        self.orderer = MoveOrderer() if ordering else None
+        # event shared with other processes or threads, stops the search
+        # once set
+        self.stop_event = stop_event
+        # helpers of a parallel search (see chess.engine.parallel) shuffle
+        # the root moves and half of them start a ply deeper, so they don't
+        # all walk the same tree
+        self.helper = helper
+        self.nodes = 0
+        self.deadline = None
+        self.node_limit = None
+        # set from elsewhere to make the running search give up
+        self.stopped = False
+        # best root move of the running iteration and its score
+        self.root_best = None
+
+    def stop(self):
+        self.stopped = True
+
+    def check_limits(self):
+        if self.stopped \
+                or (self.stop_event is not None and self.stop_event.is_set()) \
+                or (self.deadline is not None and time.perf_counter() >= self.deadline) \
+                or (self.node_limit is not None and self.nodes >= self.node_limit):
+            raise SearchTimeout
+
+    def run(self, position, limits=None, on_iteration=None) -> SearchResult:
+        """ Best move for the side to move of position, which is left
+        untouched. on_iteration gets the result of every finished depth """
+        limits = limits or SearchLimits()
+        position = position.copy()
+        start = time.perf_counter()
+        self.nodes = 0
+        self.stopped = False
+        self.deadline = start + limits.seconds if limits.seconds is not None else None
+        self.node_limit = limits.nodes
+        self.table.new_search()
+        if self.orderer is not None:
+            self.orderer.new_search()
+
+        moves = self.order(position, position.legal_moves(), 0)
+        if not moves:
+            score = -MATE if position.check else 0
+            return SearchResult(NO_MOVE, score, 0, 0, 0.0)
+        first_depth = 1
+        if self.helper:
+            rest = moves[1:]
+            Random(self.helper).shuffle(rest)
+            moves[1:] = rest
+            first_depth += self.helper % 2
+        # whatever happens there's a legal move to play
+        result = SearchResult(moves[0], 0, 0, 0, 0.0)
+        for depth in range(first_depth, limits.depth + 1):
+            try:
+                move, score = self.search_root(position, moves, depth)
+            except SearchTimeout:
+                # the first root move searched is the previous best, so a
+                # move beating it in the unfinished iteration is better
+                if self.root_best is not None and depth > 1:
+                    result.move, result.score = self.root_best
+                break
+            moves.remove(move)
+            moves.insert(0, move)
+            result = SearchResult(move, score, depth, self.nodes, time.perf_counter() - start)
+            result.pv = self.principal_variation(position, depth)
+            if on_iteration is not None:
+                on_iteration(result)
+            if abs(score) >= MATE_BOUND:
+                break
+        result.nodes = self.nodes
+        result.seconds = time.perf_counter() - start
+        logger.debug('depth %d score %d nodes %d %.0f nps', result.depth, result.score,
+                     result.nodes, result.nps)
+        if self.orderer is not None:
+            stats = self.orderer.stats
+            logger.debug('%d cutoffs, %.1f%% on the first move', stats.cutoffs,
+                         stats.first_move_rate * 100)
+        return result
+
+    def order(self, position, moves, ply, hash_move=NO_MOVE):
+        if self.orderer is None:
+            return list(moves)
+        return self.orderer.order(position, moves, ply, hash_move)
+
+    def search_root(self, position, moves, depth):
+        alpha, beta = -INFINITY, INFINITY
+        self.root_best = None
+        for move in moves:
+            position.make(move)
+            score = -self.negamax(position, depth - 1, -beta, -alpha, 1)
+            position.unmake()
+            if score > alpha:
+                alpha = score
+                self.root_best = (move, score)
+        self.table.store(position.hash, self.root_best[0], alpha, depth, EXACT)
+        return self.root_best
+
+    def negamax(self, position, depth, alpha, beta, ply):
+        if depth <= 0:
+            return self.quiescence(position, alpha, beta, ply)
+        self.nodes += 1
+        if not self.nodes & CHECK_EVERY:
+            self.check_limits()
+
+        table = self.table
+        entry = table.probe(position.hash)
+        hash_move = NO_MOVE
+        if entry is not None:
+            hash_move = entry.move
+        if entry is not None and entry.depth >= depth:
+            score = from_table(entry.score, ply)
+            if entry.flag == EXACT \
+                    or (entry.flag == LOWER and score >= beta) \
+                    or (entry.flag == UPPER and score <= alpha):
+                return score
+
+        moves = position.legal_moves()
+        if not moves:
+            # mated, or stalemate
+            return -MATE + ply if position.check else 0
+
+        original_alpha = alpha
+        best, best_move = -INFINITY, NO_MOVE
+        for index, move in enumerate(self.order(position, moves, ply, hash_move)):
+            position.make(move)
+            score = -self.negamax(position, depth - 1, -beta, -alpha, ply + 1)
+            position.unmake()
+            if score > best:
+                best, best_move = score, move
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        if self.orderer is not None:
+                            self.orderer.cutoff(position, move, depth, ply, index)
+                        break
+
+        if best <= original_alpha:
+            flag = UPPER
+        elif best >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        table.store(position.hash, best_move, to_table(best, ply), depth, flag)
+        return best
+
+    def quiescence(self, position, alpha, beta, ply):
+        """ Score of position once the captures are over. Whoever is to
+        move may stand pat on the static evaluation, unless in check """
+        self.nodes += 1
+        if not self.nodes & CHECK_EVERY:
+            self.check_limits()
+        if position.check:
+            moves = position.legal_moves()
+            if not moves:
+                return -MATE + ply
+            # every evasion is searched, there's no standing pat in check
+            best = -INFINITY
+        else:
+            best = self.evaluate(position)
+            # moves are only worth generating when standing pat isn't enough
+            if best >= beta:
+                return best
+            alpha = max(alpha, best)
+            squares = position.squares
+            moves = [
+                move for move in position.legal_moves()
+                if move >> 12 == QUEEN
+                or (squares[move >> 6 & 63] and not move >> 12 and position.see(move) >= 0)
+            ]
+        for move in self.order(position, moves, ply):
+            position.make(move)
+            score = -self.quiescence(position, -beta, -alpha, ply + 1)
+            position.unmake()
+            if score > best:
+                best = score
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+        return best
+
+    def principal_variation(self, position, depth):
+        """ Best line out of position, following the table's moves """
+        pv = []
+        for _ in range(depth):
+            entry = self.table.probe(position.hash)
+            if entry is None or entry.move not in position.legal_moves():
+                break
+            pv.append(entry.move)
+            position.make(entry.move)
+        for _ in pv:
+            position.unmake()
+        return pv
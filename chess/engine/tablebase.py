@@ -0,0 +1,478 @@
+""" Endgame tablebases: every position of a small material set (KQvK,
+KRvK, KPvK, KBNvK...) solved by retrograde analysis, with the game's own
+move rules.
+
+A table is a header followed by one signed byte per position, the value
+for the side to move: 0 for a draw, n > 0 for a win with mate in n plies
+and -(n + 1) for a loss getting mated in n plies (-1 being mated already).
+Positions are indexed by side to move and the square of every piece, in
+the order of the material's name: white's king and pieces, then black's.
+Tables are looked up through mmap, and only hold positions with white as
+the stronger side: the other way around is probed with the board flipped.
+
+Generating a table first works out the moves of every position, which is
+split over worker processes, then walks back from the mates: a position
+is won if one move takes the rival to a lost one and lost once every move
+takes them to a won one, shortest wins and longest losses first. What's
+left when nothing changes anymore is a draw. Captures and promotions leave
+the table, so the tables they lead to are generated first.
+
+    python -m chess.engine.tablebase generate KQvK KRvK KPvK --dir tables --workers 4
+"""
+import sys
+import mmap
+import time
+import struct
+import logging
+import argparse
+import multiprocessing as mp
+from pathlib import Path
+from array import array
+from collections import defaultdict, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from chess.engine.encoding import (
+    BLACK, WHITE, PAWN, ROOK, KNIGHT, BISHOP, QUEEN, KING, COLOR_OF, TYPE_OF, OPPONENT,
+    piece_code
+)
+from chess.engine.position import Position
+
+
+logger = logging.getLogger(Path(__file__).stem)
+
+MAGIC = b'CTB1'
+# magic, material name, number of positions
+HEADER = struct.Struct('<4s16sQ')
+SUFFIX = '.tb'
+
+DRAW = 0
+# positions generated per task
+CHUNK = 1 << 14
+
+LETTERS = {KING: 'K', QUEEN: 'Q', ROOK: 'R', BISHOP: 'B', KNIGHT: 'N', PAWN: 'P'}
+TYPES = {letter: type for type, letter in LETTERS.items()}
+# order of the pieces of a color in a material, king first
+ORDER = (KING, QUEEN, ROOK, BISHOP, KNIGHT, PAWN)
+
+# what a position is before any value is known
+INVALID, NORMAL, MATED, STALEMATE = range(4)
+NO_EXIT = -128
+
+TablebaseMove = namedtuple('TablebaseMove', ['move', 'value'])
+
+
+class TablebaseError(Exception):
+    """ Not a table, or not the table it should be """
+
+
+def win(plies):
+    return plies
+
+
+def loss(plies):
+    return -plies - 1
+
+
+def plies_of(value):
+    return value if value > 0 else -value - 1
+
+
+def negate(value):
+    """ Value of a position for the side that moved into one worth value """
+    if value > 0:
+        return loss(value + 1)
+    if value < 0:
+        return win(plies_of(value) + 1)
+    return DRAW
+
+
+def rank(value):
+    """ Sort key, higher being better for the side to move: quick wins,
+    then draws, then slow losses """
+    if value > 0:
+        return 1000 - value
+    if value < 0:
+        return -1000 - value
+    return 0
+
+
+def describe(value):
+    if value > 0:
+        return f'win in {(value + 1) // 2}'
+    if value < 0:
+        return f'loss in {plies_of(value) // 2}' if value < -1 else 'mated'
+    return 'draw'
+
+
+def _order(code):
+    return COLOR_OF[code] != WHITE, ORDER.index(TYPE_OF[code])
+
+
+def canonical(codes):
+    return tuple(sorted(codes, key=_order))
+
+
+def material_name(codes):
+    """ e.g. KQvK for a white king and queen against a black king """
+    codes = canonical(codes)
+    white = ''.join(LETTERS[TYPE_OF[code]] for code in codes if COLOR_OF[code] == WHITE)
+    black = ''.join(LETTERS[TYPE_OF[code]] for code in codes if COLOR_OF[code] == BLACK)
+    return f'{white}v{black}'
+
+
+def parse_material(name):
+    """ Piece codes of a material name, in table order """
+    white, _, black = name.upper().partition('V')
+    if not white.startswith('K') or not black.startswith('K') \
+            or 'K' in white[1:] + black[1:] or any(c not in TYPES for c in white + black):
+        raise ValueError(f'Not a material: {name!r}, try e.g. KQvK')
+    codes = [piece_code(WHITE, TYPES[c]) for c in white] + [piece_code(BLACK, TYPES[c]) for c in black]
+    return canonical(codes)
+
+
+def flip(pieces, turn):
+    """ The same position with colors swapped and the board upside down """
+    return [(piece_code(OPPONENT[COLOR_OF[code]], TYPE_OF[code]), sq ^ 56)
+            for code, sq in pieces], OPPONENT[turn]
+
+
+def strength(codes):
+    """ Material of white minus black's, to tell which side a table is for """
+    values = {PAWN: 1, KNIGHT: 3, BISHOP: 3, ROOK: 5, QUEEN: 9, KING: 0}
+    return sum(values[TYPE_OF[code]] * (1 if COLOR_OF[code] == WHITE else -1) for code in codes)
+
+
+def table_material(codes):
+    """ Material of the table holding codes, and whether it's flipped """
+    codes = canonical(codes)
+    flipped = canonical(piece_code(OPPONENT[COLOR_OF[code]], TYPE_OF[code]) for code in codes)
+    key = (strength(codes), material_name(codes))
+    flipped_key = (strength(flipped), material_name(flipped))
+    if flipped_key > key:
+        return flipped, True
+    return codes, False
+
+
+def index_of(squares, turn):
+    index = 0 if turn == WHITE else 1
+    for sq in squares:
+        index = index * 64 + sq
+    return index
+
+
+def squares_of_index(index, count):
+    squares = []
+    for _ in range(count):
+        squares.append(index & 63)
+        index >>= 6
+    return squares[::-1], WHITE if index == 0 else BLACK
+
+
+def dependencies(codes):
+    """ Materials a capture or a promotion takes codes to """
+    found = set()
+    for i, code in enumerate(codes):
+        rest = codes[:i] + codes[i + 1:]
+        if TYPE_OF[code] != KING:
+            found.add(table_material(rest)[0])
+        if TYPE_OF[code] == PAWN:
+            for type in (QUEEN, ROOK, BISHOP, KNIGHT):
+                found.add(table_material(rest + (piece_code(COLOR_OF[code], type),))[0])
+    return found
+
+
+class Table:
+    """ One table file mapped into memory """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path, 'rb') as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, name, self.count = HEADER.unpack_from(self.data)
+        if magic != MAGIC:
+            self.close()
+            raise TablebaseError(f'{self.path} is not a table')
+        self.name = name.rstrip(b'\0').decode()
+        self.codes = parse_material(self.name)
+        if self.count != 2 * 64 ** len(self.codes) or len(self.data) != HEADER.size + self.count:
+            self.close()
+            raise TablebaseError(f'{self.path} is the wrong size for {self.name}')
+
+    def value(self, index):
+        value = self.data[HEADER.size + index]
+        return value - 256 if value > 127 else value
+
+    def close(self):
+        self.data.close()
+
+
+class Tablebases:
+    """ The tables of a directory, opened as they are first needed """
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.tables = {}
+        names = [path.stem for path in self.directory.glob(f'*{SUFFIX}')]
+        # a table for every material of up to this many pieces is expected
+        self.max_pieces = max((len(parse_material(name)) for name in names), default=0)
+
+    def table(self, codes):
+        if codes not in self.tables:
+            path = self.directory / (material_name(codes) + SUFFIX)
+            self.tables[codes] = Table(path) if path.exists() else None
+        return self.tables[codes]
+
+    def value(self, pieces, turn):
+        """ Value for the side to move of the position with pieces, a list
+        of (piece code, square), None without a table for it """
+        codes, flipped = table_material([code for code, _ in pieces])
+        table = self.table(codes)
+        if table is None:
+            return None
+        if flipped:
+            pieces, turn = flip(pieces, turn)
+        pieces = sorted(pieces, key=lambda piece: _order(piece[0]))
+        return table.value(index_of([sq for _, sq in pieces], turn))
+
+    def probe(self, position):
+        pieces = [(code, sq) for sq, code in enumerate(position.squares) if code]
+        if len(pieces) > self.max_pieces or position.castling:
+            return None
+        return self.value(pieces, position.turn)
+
+    def best_move(self, position):
+        """ Move keeping the best value for the side to move, None when
+        position isn't in the tables """
+        if self.probe(position) is None:
+            return None
+        best = None
+        for move in position.legal_moves():
+            position.make(move)
+            value = self.probe(position)
+            position.unmake()
+            if value is None:
+                return None
+            value = negate(value)
+            if best is None or rank(value) > rank(best.value):
+                best = TablebaseMove(move, value)
+        return best
+
+    def close(self):
+        for table in self.tables.values():
+            if table is not None:
+                table.close()
+        self.tables = {}
+
+
+def _setup(codes, squares, turn):
+    """ Position of codes standing on squares, None if it can't happen """
+    if len(set(squares)) != len(squares):
+        return None
+    position = Position(turn=turn)
+    for code, sq in zip(codes, squares):
+        if TYPE_OF[code] == PAWN and sq // 8 in (0, 7):
+            return None
+        position.put(sq, code)
+    position.refresh_attacks()
+    # the side that just moved can't have left its king in check
+    if position.in_check(OPPONENT[turn]):
+        return None
+    return position
+
+
+def _moves(codes, directory, start, stop):
+    """ Kinds, best leaving move, in table move counts and in table
+    successors of the positions from start to stop """
+    tablebases = Tablebases(directory)
+    count = len(codes)
+    kinds = bytearray(stop - start)
+    exits = array('b', [NO_EXIT]) * (stop - start)
+    counts = array('B', bytes(stop - start))
+    successors = array('I')
+    for i, index in enumerate(range(start, stop)):
+        squares, turn = squares_of_index(index, count)
+        position = _setup(codes, squares, turn)
+        if position is None:
+            continue
+        moves = position.legal_moves()
+        if not moves:
+            kinds[i] = MATED if position.check else STALEMATE
+            continue
+        kinds[i] = NORMAL
+        rival = OPPONENT[turn]
+        best = None
+        for move in moves:
+            frm, to, promotion = move & 63, move >> 6 & 63, move >> 12
+            if promotion or position.squares[to]:
+                pieces = [
+                    (piece_code(COLOR_OF[code], promotion) if sq == frm and promotion else code,
+                     to if sq == frm else sq)
+                    for code, sq in zip(codes, squares) if sq != to
+                ]
+                value = tablebases.value(pieces, rival)
+                if value is None:
+                    raise TablebaseError(f'No table for {material_name([c for c, _ in pieces])}')
+                value = negate(value)
+                if best is None or rank(value) > rank(best):
+                    best = value
+            else:
+                successors.append(index_of([to if sq == frm else sq for sq in squares], rival))
+                counts[i] += 1
+        if best is not None:
+            exits[i] = best
+    tablebases.close()
+    return kinds, exits, counts, successors
+
+
+def solve(count, kinds, exits, counts, successors):
+    """ Values of every position, out of what _moves worked out """
+    # predecessors in the same layout as successors
+    offsets = array('Q', bytes(8 * (count + 1)))
+    for target in successors:
+        offsets[target + 1] += 1
+    for i in range(count):
+        offsets[i + 1] += offsets[i]
+    predecessors = array('I', bytes(4 * len(successors)))
+    filled = offsets[:-1]
+    position = 0
+    for index in range(count):
+        for _ in range(counts[index]):
+            target = successors[position]
+            predecessors[filled[target]] = index
+            filled[target] += 1
+            position += 1
+    del filled
+
+    values = array('b', bytes(count))
+    solved = bytearray(count)
+    pending = array('B', counts)
+    # longest win of the rival found among the moves of a position so far
+    longest = array('B', bytes(count))
+    levels = defaultdict(list)
+    for index in range(count):
+        kind, leaving = kinds[index], exits[index]
+        if kind == MATED:
+            levels[0].append((index, loss(0)))
+        elif kind == STALEMATE or kind == INVALID:
+            solved[index] = 1
+        elif leaving != NO_EXIT and leaving > 0:
+            levels[plies_of(leaving)].append((index, leaving))
+        elif not counts[index]:
+            # every move leaves the table
+            if leaving == DRAW:
+                solved[index] = 1
+            else:
+                levels[plies_of(leaving)].append((index, leaving))
+
+    ply = 0
+    while levels:
+        for index, value in levels.pop(ply, ()):
+            if solved[index]:
+                continue
+            solved[index] = 1
+            values[index] = value
+            for k in range(offsets[index], offsets[index + 1]):
+                parent = predecessors[k]
+                if solved[parent]:
+                    continue
+                if value < 0:
+                    levels[ply + 1].append((parent, negate(value)))
+                    continue
+                pending[parent] -= 1
+                longest[parent] = max(longest[parent], value)
+                if pending[parent]:
+                    continue
+                leaving = exits[parent]
+                if leaving == NO_EXIT or leaving < 0:
+                    plies = longest[parent] + 1
+                    if leaving != NO_EXIT:
+                        plies = max(plies, plies_of(leaving))
+                    if plies > 126:
+                        raise TablebaseError('Mate too long to store')
+                    levels[plies].append((parent, loss(plies)))
+                elif leaving == DRAW:
+                    solved[parent] = 1
+        ply += 1
+    return values
+
+
+def generate(name, directory, workers=1):
+    """ Writes the table of material name to directory, and the tables it
+    depends on if they are not there yet. Returns its path """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    codes, _ = table_material(parse_material(name))
+    name = material_name(codes)
+    path = directory / (name + SUFFIX)
+    if path.exists():
+        return path
+    for dependency in sorted(dependencies(codes), key=len):
+        generate(material_name(dependency), directory, workers)
+
+    start = time.perf_counter()
+    count = 2 * 64 ** len(codes)
+    chunks = [(i, min(i + CHUNK, count)) for i in range(0, count, CHUNK)]
+    kinds, exits, counts, successors = bytearray(), array('b'), array('B'), array('I')
+    if workers > 1:
+        with ProcessPoolExecutor(workers, mp_context=mp.get_context('spawn')) as pool:
+            parts = pool.map(_moves, *zip(*((codes, directory, a, b) for a, b in chunks)))
+            for part in parts:
+                for whole, piece in zip((kinds, exits, counts, successors), part):
+                    whole.extend(piece)
+    else:
+        for a, b in chunks:
+            for whole, piece in zip((kinds, exits, counts, successors), _moves(codes, directory, a, b)):
+                whole.extend(piece)
+    moved = time.perf_counter()
+    values = solve(count, kinds, exits, counts, successors)
+
+    # written aside and renamed, so a table is either whole or not there
+    partial = path.with_suffix('.partial')
+    with open(partial, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, name.encode(), count))
+        f.write(values.tobytes())
+    partial.replace(path)
+    logger.info('%s: %d positions, moves %.1fs, solved %.1fs', name, count,
+                moved - start, time.perf_counter() - moved)
+    return path
+
+
+def summary(path):
+    """ Wins, draws, losses and the longest mate of a table """
+    table = Table(path)
+    wins = draws = losses = longest = 0
+    for index in range(table.count):
+        value = table.value(index)
+        wins += value > 0
+        losses += value < 0
+        draws += value == 0
+        longest = max(longest, plies_of(value) if value else 0)
+    table.close()
+    return wins, draws, losses, longest
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Endgame tablebases')
+    commands = parser.add_subparsers(dest='command', required=True)
+    generate_parser = commands.add_parser('generate', help='generate tables and what they need')
+    generate_parser.add_argument('materials', nargs='+', help='e.g. KQvK KRvK KPvK')
+    generate_parser.add_argument('--dir', default='tablebases')
+    generate_parser.add_argument('--workers', '-w', type=int, default=1)
+    show_parser = commands.add_parser('show', help='what a table holds')
+    show_parser.add_argument('tables', nargs='+')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    if args.command == 'generate':
+        for name in args.materials:
+            print(generate(name, args.dir, args.workers))
+    else:
+        for path in args.tables:
+            wins, draws, losses, longest = summary(path)
+            print(f'{path}: {wins} won {draws} drawn {losses} lost, '
+                  f'longest mate {(longest + 1) // 2} moves')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
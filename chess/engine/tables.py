@@ -0,0 +1,120 @@
+""" Per square lookup tables, computed once at import time.
+
+Squares are numbered row * 8 + col, row 0 being black's back rank. Tables
+that depend on the color are indexed by its value (black = 1, white = 2).
+"""
+
+# ray directions as (row, col) steps
+NORTH, SOUTH, WEST, EAST, NORTH_WEST, NORTH_EAST, SOUTH_WEST, SOUTH_EAST = range(8)
+STEPS = ((-1, 0), (1, 0), (0, -1), (0, 1), (-1, -1), (-1, 1), (1, -1), (1, 1))
+STRAIGHTS = (NORTH, SOUTH, WEST, EAST)
+DIAGONALS = (NORTH_WEST, NORTH_EAST, SOUTH_WEST, SOUTH_EAST)
+DIRECTIONS = STRAIGHTS + DIAGONALS
+# rays walking towards higher squares meet their first blocker on the
+# lowest set bit, the others on the highest one
+INCREASING = tuple(step > (0, 0) for step in STEPS)
+KNIGHT_STEPS = ((-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1))
+KING_STEPS = STEPS
+PAWN_STEP = (None, 1, -1)
+PAWN_ROW = (None, 1, 6)
+
+
+def _on_board(row, col):
+    return 0 <= row < 8 and 0 <= col < 8
+
+
+def _walk(sq, step, limit=7):
+    """ Squares from sq (excluded) along step, nearest first """
+    row, col = divmod(sq, 8)
+    squares = []
+    for _ in range(limit):
+        row, col = row + step[0], col + step[1]
+        if not _on_board(row, col):
+            break
+        squares.append(row * 8 + col)
+    return tuple(squares)
+
+
+def _jumps(sq, steps):
+    return tuple(j for step in steps for j in _walk(sq, step, limit=1))
+
+
+def _bits(squares):
+    bb = 0
+    for sq in squares:
+        bb |= 1 << sq
+    return bb
+
+
+ROW_COL = tuple(divmod(sq, 8) for sq in range(64))
+
+RAY_SQUARES = tuple(tuple(_walk(sq, step) for sq in range(64)) for step in STEPS)
+RAYS = tuple(tuple(_bits(ray) for ray in rays) for rays in RAY_SQUARES)
+
+KNIGHT_SQUARES = tuple(_jumps(sq, KNIGHT_STEPS) for sq in range(64))
+KNIGHT_ATTACKS = tuple(_bits(squares) for squares in KNIGHT_SQUARES)
+
+KING_SQUARES = tuple(_jumps(sq, KING_STEPS) for sq in range(64))
+KING_ATTACKS = tuple(_bits(squares) for squares in KING_SQUARES)
+
+PAWN_PUSH_SQUARES = (None,) + tuple(
+    tuple(_walk(sq, (step, 0), limit=1) for sq in range(64))
+    for step in PAWN_STEP[1:]
+)
+# a pawn on its starting row also gets the square two rows ahead
+PAWN_DOUBLE_SQUARES = (None,) + tuple(
+    tuple(_walk(sq, (step * 2, 0), limit=1) if sq // 8 == row else () for sq in range(64))
+    for step, row in zip(PAWN_STEP[1:], PAWN_ROW[1:])
+)
+PAWN_CAPTURE_SQUARES = (None,) + tuple(
+    tuple(_jumps(sq, ((step, -1), (step, 1))) for sq in range(64))
+    for step in PAWN_STEP[1:]
+)
+PAWN_PUSH = (None,) + tuple(tuple(_bits(s) for s in table) for table in PAWN_PUSH_SQUARES[1:])
+PAWN_DOUBLE = (None,) + tuple(tuple(_bits(s) for s in table) for table in PAWN_DOUBLE_SQUARES[1:])
+PAWN_CAPTURE = (None,) + tuple(tuple(_bits(s) for s in table) for table in PAWN_CAPTURE_SQUARES[1:])
+
+
+def _between():
+    """ Squares strictly between two squares sharing a line, 0 for squares
+    that are not aligned """
+    between = [[0] * 64 for _ in range(64)]
+    for sq in range(64):
+        for ray in RAY_SQUARES:
+            bb = 0
+            for target in ray[sq]:
+                between[sq][target] = bb
+                bb |= 1 << target
+    return tuple(tuple(row) for row in between)
+
+
+BETWEEN = _between()
+
+
+def ray_attacks(sq, occupied, directions):
+    """ Squares a slider on sq reaches along directions, the first blocker
+    of every ray included """
+    attacks = 0
+    for direction in directions:
+        ray = RAYS[direction][sq]
+        blockers = ray & occupied
+        if blockers:
+            if INCREASING[direction]:
+                first = (blockers & -blockers).bit_length() - 1
+            else:
+                first = blockers.bit_length() - 1
+            ray ^= RAYS[direction][first]
+        attacks |= ray
+    return attacks
+
+
+def rook_attacks(sq, occupied):
+    return ray_attacks(sq, occupied, STRAIGHTS)
+
+
+def bishop_attacks(sq, occupied):
+    return ray_attacks(sq, occupied, DIAGONALS)
+
+
+def queen_attacks(sq, occupied):
+    return ray_attacks(sq, occupied, DIRECTIONS)
@@ -0,0 +1,259 @@
+""" Tournaments between two player types, with no display.
+
+Games go out to a pool of worker processes and colors alternate, so each
+player gets white in half of them. Every game is written to the results
+file as a JSON line the moment it's over, so a long match that gets cut
+short keeps everything played so far. Players are named as in the
+game's menu:
+
+    python -m chess.engine.tournament 'search AI' 'random AI' --games 200 --workers 4
+
+At the end comes a score table, the Elo difference with its 95% error
+bars and the games played per second. Unfinished games, stopped at the
+ply limit, count as draws.
+"""
+import sys
+import json
+import math
+import time
+import inspect
+import logging
+import argparse
+import multiprocessing as mp
+from pathlib import Path
+from dataclasses import dataclass
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from chess.engine.game import MAX_PLIES, play
+from chess.engine.encoding import move_list, move_name
+from chess.engine.fen import START_FEN, position_from_fen
+from chess.engine.pgn import PgnGame, result_of, format_game
+from chess.engine.players import PlayerFactory
+from chess.engine.records import GameRecord, RecordWriter
+
+
+logger = logging.getLogger(Path(__file__).stem)
+
+# 95% of a normal distribution
+Z = 1.96
+
+
+def engine_of(name):
+    """ Engine player class behind a player name of the game's menu """
+    try:
+        return PlayerFactory.make(name)
+    except KeyError:
+        raise ValueError(f'No engine player called {name!r}') from None
+
+
+def make_player(engine, **options):
+    """ An engine player given the options it takes, the rest are left out """
+    parameters = inspect.signature(engine).parameters
+    return engine(**{
+        key: value for key, value in options.items() if key in parameters and value is not None
+    })
+
+
+@dataclass
+class Match:
+    """ What every game of a tournament is played with """
+    names: tuple
+    engines: tuple
+    seconds: float = 0.1
+    max_plies: int = MAX_PLIES
+    fen: str = START_FEN
+    book: str = None
+    tablebases: str = None
+    seed: int = 0
+    records: str = None
+
+
+def play_game(match: Match, number) -> dict:
+    """ Game number of a match: the first player has white in even games """
+    first = number % 2 == 0
+    white, black = (0, 1) if first else (1, 0)
+    players = [
+        make_player(
+            match.engines[i], seconds=match.seconds, book=match.book,
+            tablebases=match.tablebases, seed=match.seed * 100_003 + number * 2 + i
+        )
+        for i in (white, black)
+    ]
+    try:
+        result = play(*players, position=position_from_fen(match.fen), max_plies=match.max_plies)
+    finally:
+        for player in players:
+            player.close()
+    if match.records is not None:
+        # workers append themselves, the records file is locked per game
+        with RecordWriter(match.records) as writer:
+            writer.append(GameRecord.from_result(result, match.fen))
+    return {
+        'game': number,
+        'white': match.names[white],
+        'black': match.names[black],
+        'status': result.status.name,
+        'result': result_of(result.status.name, result.winner),
+        # first player's score
+        'score': result.score if first else 1 - result.score,
+        'plies': result.plies,
+        'seconds': round(result.seconds, 3),
+        'moves': result.moves,
+    }
+
+
+def run(match: Match, games, workers=1):
+    """ Yields the results of games games of match as they finish """
+    if workers == 1:
+        for number in range(games):
+            yield play_game(match, number)
+        return
+    with ProcessPoolExecutor(workers, mp_context=mp.get_context('spawn')) as pool:
+        futures = [pool.submit(play_game, match, number) for number in range(games)]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+@dataclass
+class Score:
+    wins: int = 0
+    draws: int = 0
+    losses: int = 0
+
+    @property
+    def games(self):
+        return self.wins + self.draws + self.losses
+
+    @property
+    def points(self):
+        return self.wins + self.draws / 2
+
+    def add(self, score):
+        if score == 1:
+            self.wins += 1
+        elif score == 0:
+            self.losses += 1
+        else:
+            self.draws += 1
+
+
+def elo(score):
+    """ Elo difference that expects score, a fraction of the points """
+    if score <= 0:
+        return -math.inf
+    if score >= 1:
+        return math.inf
+    # plus zero so an even score isn't -0
+    return -400 * math.log10(1 / score - 1) + 0.0
+
+
+def elo_difference(score: Score):
+    """ Elo difference of a score and its 95% interval, (elo, low, high).
+    None without games, and the bounds are None for a perfect score (or a
+    perfect loss), which has no spread to go by """
+    n = score.games
+    if n == 0:
+        return None
+    if score.wins == n or score.losses == n:
+        return elo(score.points / n), None, None
+    mean = score.points / n
+    deviation = math.sqrt((
+        score.wins * (1 - mean) ** 2 + score.draws * (0.5 - mean) ** 2 + score.losses * mean ** 2
+    ) / n)
+    margin = Z * deviation / math.sqrt(n)
+    return elo(mean), elo(mean - margin), elo(mean + margin)
+
+
+def table(names, score: Score):
+    """ Score table of both players, the second one's score mirrors the
+    first's """
+    games = score.games or 1
+    rows = [
+        (names[0], score.wins, score.draws, score.losses),
+        (names[1], score.losses, score.draws, score.wins),
+    ]
+    width = max(len(name) for name in names) + 2
+    lines = [f'{"player":<{width}}{"games":>7}{"wins":>7}{"draws":>7}{"losses":>8}{"score":>9}']
+    for name, wins, draws, losses in rows:
+        points = wins + draws / 2
+        lines.append(
+            f'{name:<{width}}{score.games:>7}{wins:>7}{draws:>7}{losses:>8}'
+            f'{100 * points / games:>8.1f}%'
+        )
+    return '\n'.join(lines)
+
+
+def pgn_game(result, fen=START_FEN) -> PgnGame:
+    """ PgnGame of a game's result """
+    game = PgnGame({
+        'Round': str(result['game'] + 1),
+        'White': result['white'],
+        'Black': result['black'],
+        'Result': result['result'],
+    }, move_list(result['moves']))
+    if fen != START_FEN:
+        game.tags.update(SetUp='1', FEN=fen)
+    return game
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Plays two player types against each other')
+    parser.add_argument('first', help="player name, e.g. 'search AI'")
+    parser.add_argument('second', help="player name, e.g. 'random AI'")
+    parser.add_argument('--games', '-g', type=int, default=100)
+    parser.add_argument('--workers', '-w', type=int, default=1)
+    parser.add_argument('--seconds', type=float, default=0.1, help='thinking time per move')
+    parser.add_argument('--max-plies', type=int, default=MAX_PLIES)
+    parser.add_argument('--fen', default=START_FEN, help='starting position')
+    parser.add_argument('--book', help='opening book for both players')
+    parser.add_argument('--tablebases', help='endgame tablebases folder for both players')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', '-o', default='tournament.jsonl', help='results, one JSON line a game')
+    parser.add_argument('--pgn', help='also write the games here as PGN')
+    parser.add_argument('--records', help='also append the games to this records file')
+    args = parser.parse_args(argv)
+
+    names = (args.first, args.second)
+    try:
+        engines = tuple(engine_of(name) for name in names)
+        # a bad FEN should fail here, not in every worker
+        position_from_fen(args.fen)
+    except ValueError as e:
+        parser.error(str(e))
+    match = Match(
+        names, engines, args.seconds, args.max_plies, args.fen, args.book, args.tablebases,
+        args.seed, args.records
+    )
+
+    score = Score()
+    start = time.perf_counter()
+    pgn = open(args.pgn, 'w') if args.pgn else None
+    try:
+        with open(args.out, 'w') as out:
+            for result in run(match, args.games, args.workers):
+                score.add(result['score'])
+                out.write(json.dumps({**result, 'moves': [move_name(m) for m in result['moves']]}) + '\n')
+                out.flush()
+                if pgn is not None:
+                    pgn.write(format_game(pgn_game(result, args.fen)))
+                    pgn.flush()
+                logger.info('Game %d: %s %s', result['game'], result['status'], result['score'])
+    finally:
+        if pgn is not None:
+            pgn.close()
+    seconds = time.perf_counter() - start
+
+    print(table(names, score))
+    difference = elo_difference(score)
+    if difference is None:
+        print('No games, no Elo difference')
+    elif difference[1] is None:
+        print(f'{names[0]} {"won" if score.wins else "lost"} every game, the Elo difference has no bounds')
+    else:
+        print('Elo difference {:+.0f} ({:+.0f}, {:+.0f}) of {} over {}'.format(*difference, *names))
+    print(f'{score.games} games in {seconds:.1f}s, {score.games / seconds if seconds else 0:.2f} games/s')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,141 @@
+import logging
+from pathlib import Path
+from dataclasses import dataclass
+from collections import namedtuple
+
+
+logger = logging.getLogger(Path(__file__).stem)
+
+# kind of score stored in an entry
+EXACT, LOWER, UPPER = 1, 2, 3
+
+ENTRY_SIZE = 16  # bytes: a key word and a data word
+BUCKET = 2  # entries per bucket: depth preferred, then always replace
+
+Entry = namedtuple('Entry', ['move', 'score', 'depth', 'flag'])
+
+
+@dataclass
+class TableStats:
+    probes: int = 0
+    hits: int = 0
+    misses: int = 0
+    # misses on a bucket holding entries of other positions
+    collisions: int = 0
+    stores: int = 0
+    # stores that threw away another position's entry
+    overwrites: int = 0
+
+    @property
+    def hit_rate(self):
+        return self.hits / self.probes if self.probes else 0.0
+
+
+class TranspositionTable:
+    """ Fixed size table of search results keyed by zobrist hash.
+
+    Every entry is two 64 bit words in a flat buffer: the data word (move,
+    score, depth, flag and search age packed together) and the key xor the
+    data. A torn entry never matches its key, so the buffer can be shared
+    with other processes without locks. Buckets hold a depth preferred slot
+    and an always replace slot; entries from earlier searches lose their
+    claim on the depth preferred slot. """
+
+    def __init__(self, size_mb=16, buffer=None):
+        """ size_mb caps the memory taken by the table. buffer, if given,
+        is where entries live (e.g. shared memory) and decides the size """
+        if buffer is None:
+            buckets = self.buckets_for(size_mb)
+            buffer = bytearray(buckets * BUCKET * ENTRY_SIZE)
+        self.buffer = buffer
+        self.words = memoryview(buffer).cast('Q')
+        self.buckets = len(self.words) // (BUCKET * 2)
+        self.mask = self.buckets - 1
+        self.age = 0
+        self.stats = TableStats()
+        if self.buckets & self.mask:
+            raise ValueError(f'Bucket count must be a power of two, got {self.buckets}')
+
+    @staticmethod
+    def buckets_for(size_mb):
+        """ Largest power of two bucket count fitting in size_mb """
+        buckets = max(1, int(size_mb * 2 ** 20) // (BUCKET * ENTRY_SIZE))
+        return 1 << (buckets.bit_length() - 1)
+
+    @property
+    def size_mb(self):
+        return len(self.buffer) / 2 ** 20
+
+    def new_search(self):
+        self.age = (self.age + 1) & 0x3F
+
+    def clear(self):
+        self.buffer[:] = bytes(len(self.buffer))
+        self.stats = TableStats()
+
+    @staticmethod
+    def pack(move, score, depth, flag, age):
+        return move | (score + 0x8000) << 16 | max(depth, 0) << 32 | flag << 40 | age << 42
+
+    def probe(self, key):
+        """ Entry stored for key, or None """
+        words = self.words
+        stats = self.stats
+        stats.probes += 1
+        i = (key & self.mask) * BUCKET * 2
+        occupied = False
+        for slot in range(i, i + BUCKET * 2, 2):
+            data = words[slot + 1]
+            if data and words[slot] ^ data == key:
+                stats.hits += 1
+                return Entry(
+                    data & 0xFFFF,
+                    (data >> 16 & 0xFFFF) - 0x8000,
+                    data >> 32 & 0xFF,
+                    data >> 40 & 0x3
+                )
+            occupied = occupied or bool(data)
+        stats.misses += 1
+        if occupied:
+            stats.collisions += 1
+        return None
+
+    def store(self, key, move, score, depth, flag):
+        words = self.words
+        stats = self.stats
+        stats.stores += 1
+        i = (key & self.mask) * BUCKET * 2
+        data = self.pack(move, score, depth, flag, self.age)
+
+        preferred = words[i + 1]
+        preferred_key = words[i] ^ preferred
+        if preferred and preferred_key != key and (preferred >> 42) == self.age \
+                and depth < (preferred >> 32 & 0xFF):
+            # a deeper entry of this search keeps the depth preferred slot
+            slot = i + 2
+        else:
+            slot = i
+            if preferred and preferred_key != key:
+                # demote the old entry to the always replace slot
+                self._write(i + 2, preferred_key, preferred, key)
+        self._write(slot, key, data, key)
+
+    def _write(self, slot, key, data, new_key):
+        words = self.words
+        old = words[slot + 1]
+        if old and words[slot] ^ old not in (key, new_key):
+            self.stats.overwrites += 1
+        words[slot] = key ^ data
+        words[slot + 1] = data
+
+    def release(self):
+        """ Lets go of the buffer, e.g. before closing shared memory """
+        self.words.release()
+        if isinstance(self.buffer, memoryview):
+            self.buffer.release()
+
+    def hashfull(self):
+        """ Permille of the first thousand entries in use, UCI style """
+        sample = min(1000, len(self.words) // 2)
+        used = sum(1 for slot in range(0, sample * 2, 2) if self.words[slot + 1])
+        return used * 1000 // sample
@@ -0,0 +1,36 @@
+""" Zobrist keys. A position hash is the xor of the key of every piece on
+its square, the castling rights key and, with black to move, BLACK_TO_MOVE.
+
+Keys come out of a fixed seed, so hashes are the same on every process
+and every run and can be stored on disk.
+"""
+from random import Random
+
+from chess.engine.encoding import BLACK, PIECE_CODES
+
+SEED = 0x0C4E55
+
+
+def _keys():
+    rng = Random(SEED)
+    pieces = [
+        tuple(rng.getrandbits(64) for _ in range(64)) if code in PIECE_CODES else None
+        for code in range(27)
+    ]
+    castling = tuple(rng.getrandbits(64) for _ in range(16))
+    return tuple(pieces), castling, rng.getrandbits(64)
+
+
+# PIECE_KEYS[code][sq], CASTLING_KEYS[castling rights]
+PIECE_KEYS, CASTLING_KEYS, BLACK_TO_MOVE = _keys()
+
+
+def zobrist_hash(position):
+    """ Hash of position computed from scratch """
+    h = CASTLING_KEYS[position.castling]
+    if position.turn == BLACK:
+        h ^= BLACK_TO_MOVE
+    for sq, code in enumerate(position.squares):
+        if code:
+            h ^= PIECE_KEYS[code][sq]
+    return h
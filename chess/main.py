@@ -7,14 +7,11 @@ from chess.states.intro import Intro
 from chess.states.game import Game
 
 
-# initialization
-pg.init()
-pg.display.set_caption(s.TITLE)
-SCREEN = pg.display.set_mode((s.WIDTH, s.HEIGHT))
-SCREEN_RECT = SCREEN.get_rect()
-
-
 def main():
+    # initialization
+    pg.init()
+    pg.display.set_caption(s.TITLE)
+    pg.display.set_mode((s.WIDTH, s.HEIGHT))
     logging.basicConfig(
         format='[%(asctime)s] [%(name)s] [%(levelname)s]: %(message)s',
         datefmt='%I:%M:%S %p',
@@ -59,6 +59,13 @@ class Console(Panel):
         self.history.append((level, text))
         self.tp.log(self.history, configs=self.level_configs)
 
+    def update_last(self, text, level=LogType.INFO):
+        """ Rewrites the last line logged """
+        if not self.history:
+            return self.log(text, level)
+        self.history[-1] = (level, text)
+        self.tp.log(self.history, configs=self.level_configs)
+
     def type(self, text):
         self.tp.log(
             text=[(LogType.CUSTOM, text)],
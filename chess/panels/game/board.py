@@ -6,7 +6,12 @@ import numpy as np
 
 import chess.settings as s
 from chess.utils.coords import Coords
-from chess.pieces import PieceFactory, PieceId, PieceType, Color
+from chess.pieces import PieceFactory
+from chess.engine.position import Position
+from chess.engine.encoding import encode_move
+from chess.engine.pieces import PieceId, PieceType, Color, CODE_COLOR, CODE_TYPE, new_grid, test_grid
+from chess.engine.fen import parse_fen, fen_of
+from chess.engine.game import GameStatus, game_status
 
 
 logger = logging.getLogger(Path(__file__).stem)
@@ -31,6 +36,12 @@ class Board(pg.sprite.Sprite):
         ))
         self.captured = []
         self.grid = self.get_new_grid()
+        self.position = Position.from_grid(self.grid)
+        # legal moves and game status of the current ply, keyed by position
+        # and color. Dropped whenever the board changes
+        self.moves_cache = {}
+        self.status_cache = {}
+        self.hanging_cache = {}
         self.selected = None
         self.console = None
         self.draw_grid()
@@ -58,56 +69,58 @@ class Board(pg.sprite.Sprite):
                     pieces.append(self.pieces[cell])
         return pieces
 
+    def get_position(self, grid) -> Position:
+        """ Bitboard position for grid. The board's own grid is kept in sync
+        with self.position, any other grid gets a fresh one """
+        if grid is self.grid:
+            return self.position
+        return Position.from_grid(grid, castling=self.position.castling)
+
     def get_possible_moves(self, grid, color: Color):
-        pos_moves = []
-        for p in self.get_pieces_for_color(grid, color):
-            if p.type == PieceType.king:
-                for castles in self.get_castle_moves(grid, p):
-                    pos_moves.extend(castles)
-            for move in p.possible_moves(grid):
-                m = (p.pos, move)
-                pos_grid = self.simulate_move(grid, m)
-                if not self.is_king_checked(pos_grid, color):
-                    pos_moves.append(m)
-        return pos_moves
+        if grid is not self.grid:
+            return self._possible_moves(self.get_position(grid), color)
+        key = (self.position.key(), color)
+        if key not in self.moves_cache:
+            self.moves_cache[key] = self._possible_moves(self.position, color)
+        return self.moves_cache[key]
+
+    @staticmethod
+    def _possible_moves(position, color: Color):
+        # promotions are picked after the move, so the four moves of a
+        # promoting pawn fold into one
+        moves = dict.fromkeys(m & 0xFFF for m in position.legal_moves(color.value))
+        return [(Coords.from_square(m & 63), Coords.from_square(m >> 6)) for m in moves]
+
+    def get_status(self, color: Color) -> GameStatus:
+        """ Whether color, on the move, has been mated or stalemated """
+        key = (self.position.key(), color)
+        if key not in self.status_cache:
+            self.status_cache[key] = game_status(self.position, color.value)
+        return self.status_cache[key]
+
+    def hanging_pieces(self, color: Color):
+        """ Pieces of color the rival can win material from, by static
+        exchange evaluation """
+        key = (self.position.key(), color)
+        if key not in self.hanging_cache:
+            self.hanging_cache[key] = [
+                self.get_piece_at(Coords.from_square(sq), self.grid)
+                for sq in self.position.hanging(color.value)
+            ]
+        return self.hanging_cache[key]
+
+    def invalidate(self):
+        self.moves_cache.clear()
+        self.status_cache.clear()
+        self.hanging_cache.clear()
 
     def is_king_checked(self, grid, color):
-        rival_color = Color.next(color)
-        for p in self.get_pieces_for_color(grid, rival_color):
-            for move in p.possible_moves(grid):
-                piece_to = self.get_piece_at(move, grid)
-                if piece_to and piece_to.type == PieceType.king:
-                    return True
-        return False
+        return self.get_position(grid).in_check(Color(color).value)
 
     def get_castle_moves(self, grid, king):
-        rook_l, rook_r = self.get_piece(king.color, PieceType.rook, 1), \
-                         self.get_piece(king.color, PieceType.rook, 2)
-        castle_l, castle_r = king.castle_positions(grid)
-        can_left_castle, can_right_castle = True, True
-        if not king.moved and not king.is_checked:
-            if rook_l and not rook_l.moved and castle_l:
-                for move in castle_l:
-                    pos_grid = self.simulate_move(grid, (king.pos, move))
-                    if self.is_king_checked(pos_grid, king.color):
-                        can_left_castle = False
-                        break
-            else:
-                can_left_castle = False
-            if rook_r and not rook_r.moved and castle_r:
-                for move in castle_r:
-                    pos_grid = self.simulate_move(grid, (king.pos, move))
-                    if self.is_king_checked(pos_grid, king.color):
-                        can_right_castle = False
-                        break
-            else:
-                can_right_castle = False
-        else:
-            can_left_castle, can_right_castle = False, False
-
         return [
-            list(map(lambda x: (king.pos, x), castle_l)) if can_left_castle else [],
-            list(map(lambda x: (king.pos, x), castle_r)) if can_right_castle else []
+            [(king.pos, Coords.from_square(sq)) for sq in castle]
+            for castle in self.get_position(grid).castle_squares(king.color.value)
         ]
 
     def is_piece_at(self, pos: Coords, grid):
@@ -121,12 +134,11 @@ class Board(pg.sprite.Sprite):
         return None
 
     def promotions(self, color: Color, grid=None):
-        grid = grid if grid else self.grid
-        promo_row = 0 if color == Color.white else 7
-        for piece in self.get_pieces_for_color(grid, color):
-            if piece.type == PieceType.pawn and piece.pos.row == promo_row:
-                return piece
-        return None
+        grid = grid if grid is not None else self.grid
+        sq = self.get_position(grid).promotion_square(color.value)
+        if sq is None:
+            return None
+        return self.get_piece_at(Coords.from_square(sq), grid)
 
     def handle_promotions(self, pawn, new_piece):
         new_type = PieceType[new_piece]
@@ -141,6 +153,8 @@ class Board(pg.sprite.Sprite):
 
         # update grid
         self.grid[pawn.row, pawn.col] = new_piece.pid
+        self.position.promote(pawn.pos.square, new_type.value)
+        self.invalidate()
         del self.pieces[pawn.pid]
         self.pieces[new_piece.pid] = new_piece
 
@@ -163,24 +177,38 @@ class Board(pg.sprite.Sprite):
         return sel
 
     def is_castling_with_rook(self, piece, to):
-        if piece.type == PieceType.king:
-            if piece.pos.col - 2 == to.col:
-                return self.get_piece(piece.color, PieceType.rook, 1)
-            elif piece.pos.col + 2 == to.col:
-                return self.get_piece(piece.color, PieceType.rook, 2)
+        if piece.type == PieceType.king and abs(piece.pos.col - to.col) == 2:
+            # by square, as boards loaded from FEN number their rooks freely
+            rook_from, _ = Position.castle_rook(piece.pos.square, to.square)
+            return self.get_piece_at(Coords.from_square(rook_from), self.grid)
         return None
 
     def move(self, from_: Coords, to: Coords):
         piece_from = self.get_piece_at(from_, self.grid, fail_if_no_piece=True)
         rook = self.is_castling_with_rook(piece_from, to)
+        self.position.make(encode_move(from_.square, to.square))
+        self.invalidate()
         if rook:
             self._castle_move(king=piece_from, rook=rook, to=to)
         else:
             self._move(from_, to)
 
+    def play(self, move):
+        """ Plays a packed move, promotion and all """
+        to = Coords.from_square(move >> 6 & 63)
+        self.move(Coords.from_square(move & 63), to)
+        if move >> 12:
+            self.handle_promotions(self.get_piece_at(to, self.grid), PieceType(move >> 12).name)
+
+    def replay(self, moves):
+        """ Plays a game's packed moves, e.g. a GameRecord's, on the board """
+        for move in moves:
+            self.play(move)
+
     def _castle_move(self, king, rook, to):
         off = -1 if king.pos.col + 2 == to.col else 1
-        self.console.log('Castling!')
+        if self.console is not None:
+            self.console.log('Castling!')
 
         # move king
         self.grid[to.row, to.col], self.grid[king.pos.row, king.pos.col] = \
@@ -192,6 +220,10 @@ class Board(pg.sprite.Sprite):
         # update sprites
         king.pos = to
         rook.pos = Coords(x=to.col+off, y=to.row)
+        king.moved, rook.moved = True, True
+
+        if self.position.check:
+            self.get_king(Color.next(king.color)).is_checked = True
 
     def _move(self, from_: Coords, to: Coords):
         piece_from = self.get_piece_at(from_, self.grid, fail_if_no_piece=True)
@@ -214,7 +246,7 @@ class Board(pg.sprite.Sprite):
         piece_from.pos = to
 
         # check if movement results in any kind of check
-        if self.is_king_checked(self.grid, Color.next(piece_from.color)):
+        if self.position.check:
             rival_king = self.get_king(Color.next(piece_from.color))
             rival_king.is_checked = True
 
@@ -224,6 +256,26 @@ class Board(pg.sprite.Sprite):
         except AttributeError:
             pass
 
+    def load_fen(self, fen) -> Color:
+        """ Sets the board up as a FEN string says, returns the side to move """
+        parsed = parse_fen(fen)
+        for piece in self.pieces.values():
+            self.sprites.remove(piece)
+        self.pieces.clear()
+        self.captured = []
+        self.selected = None
+        self.grid = np.array(parsed.grid)
+        self.position = Position.from_grid(self.grid, turn=parsed.turn, castling=parsed.castling)
+        self.invalidate()
+        self.draw_armies()
+        for color in Color:
+            self.get_king(color).is_checked = self.position.in_check(color.value)
+        return Color(parsed.turn)
+
+    def fen(self, halfmove=0, fullmove=1):
+        """ FEN string of the board as it stands """
+        return fen_of(self.position, halfmove, fullmove)
+
     def px_to_grid(self, pos: Coords):
         coords = (pos - self.rect.topleft) / s.TILESIZE // 2
         return Coords(x=coords.x, y=coords.y)
@@ -249,18 +301,27 @@ class Board(pg.sprite.Sprite):
         for i, row in enumerate(self.grid):
             for j, cell in enumerate(row):
                 if cell:
-                    c = str(cell)
                     pid = PieceId(
                         num=cell,
-                        color=Color(int(c[-2])),
-                        type=PieceType(int(c[-1]))
+                        color=CODE_COLOR[cell % 100],
+                        type=CODE_TYPE[cell % 100]
                     )
                     piece = PieceFactory.make(pid, Coords(x=j, y=i))
                     self.pieces[pid.num] = piece
                     self.sprites.add(piece)
 
+    def draw_hanging(self):
+        for color in Color:
+            for piece in self.hanging_pieces(color):
+                rect = pg.Rect(
+                    piece.col * s.TILESIZE * 2, piece.row * s.TILESIZE * 2,
+                    s.TILESIZE * 2, s.TILESIZE * 2
+                )
+                pg.draw.rect(self.image, s.RED, rect, 2)
+
     def draw_selected(self):
         self.draw_grid()
+        self.draw_hanging()
         if self.selected is not None:
             piece = self.get_piece_at(self.selected, self.grid)
             if piece:
@@ -293,36 +354,10 @@ class Board(pg.sprite.Sprite):
                     latest = num
         return latest
 
-    @staticmethod
-    def simulate_move(grid, move) -> np.array:
-        new_grid = np.copy(grid)
-        from_, to = move
-        new_grid[to.row, to.col], new_grid[from_.row, from_.col] = \
-            new_grid[from_.row, from_.col], 0
-        return new_grid
-
     @staticmethod
     def get_new_grid():
-        return np.array([
-            [112, 113, 114, 115, 116, 214, 213, 212],
-            [111, 211, 311, 411, 511, 611, 711, 811],
-            [0, 0, 0, 0, 0, 0, 0, 0],
-            [0, 0, 0, 0, 0, 0, 0, 0],
-            [0, 0, 0, 0, 0, 0, 0, 0],
-            [0, 0, 0, 0, 0, 0, 0, 0],
-            [121, 221, 321, 421, 521, 621, 721, 821],
-            [122, 123, 124, 125, 126, 224, 223, 222]
-        ])
+        return np.array(new_grid())
 
     @staticmethod
     def get_test_grid():
-        return np.array([
-            [0, 0, 0, 0, 116, 0, 0, 0],
-            [0, 221, 321, 0, 0, 0, 0, 0],
-            [0, 0, 0, 0, 0, 0, 0, 0],
-            [0, 0, 0, 0, 0, 0, 0, 0],
-            [0, 0, 0, 0, 0, 0, 0, 0],
-            [0, 0, 0, 0, 0, 0, 0, 0],
-            [121, 0, 0, 421, 521, 621, 721, 821],
-            [122, 123, 124, 125, 126, 224, 223, 222]
-        ])
\ No newline at end of file
+        return np.array(test_grid())
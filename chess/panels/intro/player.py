@@ -9,7 +9,7 @@ import chess.settings as s
 from chess.utils.coords import Coords
 from chess.utils.typewriter import Typewriter, TypewriterConfig
 from chess.panels.intro.button import Button, SelectionButton
-from chess.pieces import Color
+from chess.engine.pieces import Color
 
 
 logger = logging.getLogger(Path(__file__).stem)
@@ -101,6 +101,26 @@ I\'m actually going to tell you what it does:
    import random as r
    r.choice(possible_moves)
 """
+            ),
+            SelectionButton(
+                surface=self.surface,
+                pos=Coords(x=8, y=4),
+                size=size,
+                text='search AI',
+                value='search AI',
+                desc="""Thinks before it shoots. Looks a few moves ahead
+with alpha-beta pruning, one ply deeper each
+pass, until its second on the clock is up."""
+            ),
+            SelectionButton(
+                surface=self.surface,
+                pos=Coords(x=8, y=5),
+                size=size,
+                text='mcts AI',
+                value='mcts AI',
+                desc="""Plays hundreds of silly games against itself
+and goes with the move that won the most.
+Remembers what it played out last turn."""
             )
         ]
 
@@ -109,7 +129,7 @@ I\'m actually going to tell you what it does:
         return [
             Button(
                 surface=self.surface,
-                pos=Coords(x=8, y=4),
+                pos=Coords(x=8, y=6),
                 size=size,
                 text='back',
                 value='back',
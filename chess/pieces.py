@@ -1,37 +1,15 @@
 import sys
 import logging
 from pathlib import PurePath, Path
-from collections import namedtuple
-from itertools import chain
-from enum import Enum
 
 import pygame as pg
-import numpy as np
 
 import chess.settings as s
 from chess.utils.coords import Coords
+from chess.engine.pieces import PieceType
 
 logger = logging.getLogger(Path(__file__).stem)
-PieceId = namedtuple('PieceId', ['num', 'color', 'type'])
-Offsets = namedtuple('Offsets', ['up', 'down', 'left', 'right'], defaults=[0, 0, 0, 0])
-
-
-class PieceType(Enum):
-    pawn = 1
-    rook = 2
-    knight = 3
-    bishop = 4
-    queen = 5
-    king = 6
-
-
-class Color(Enum):
-    black = 1
-    white = 2
-
-    @staticmethod
-    def next(color):
-        return Color.white if color == Color.black else Color.black
+SPRITE_SIZE = int(s.TILESIZE * 1.5)
 
 
 class PieceFactory:
@@ -44,25 +22,35 @@ class PieceFactory:
 
 
 class Piece(pg.sprite.Sprite):
+    # loaded sprites by (color, type), shared by every piece
+    images = {}
+
     def __init__(self, type, pid, color, pos):
         super().__init__()
         self.pid = pid
         self.type = type
         self.color = color
-        self.move_offset = None
-        self.image = self.load_image()
-        self.rect = self.image.get_rect()
+        # the image is loaded the first time the piece is drawn, so pieces
+        # can be built without a display
+        self.rect = pg.Rect(0, 0, SPRITE_SIZE, SPRITE_SIZE)
         self.pos = pos
         # noinspection PyTypeChecker
         center = self.pos * s.TILESIZE * 2 + (s.TILESIZE, s.TILESIZE)
         self.rect.center = (center.x, center.y)
 
+    @property
+    def image(self):
+        key = (self.color, self.type)
+        if key not in self.images:
+            self.images[key] = self.load_image()
+        return self.images[key]
+
     def load_image(self):
         """ Load sprite for each piece and transform it accordingly"""
         img = pg.image.load(
             str(PurePath(s.SPRITE_FOLDER, f'{self.color.name}_{self.type.name}.png'))
         ).convert_alpha()
-        img = pg.transform.scale(img, (int(s.TILESIZE * 1.5), int(s.TILESIZE * 1.5)))
+        img = pg.transform.scale(img, (SPRITE_SIZE, SPRITE_SIZE))
         return img
 
     def update(self):
@@ -70,72 +58,9 @@ class Piece(pg.sprite.Sprite):
         center = self.pos * s.TILESIZE * 2 + Coords(x=s.TILESIZE, y=s.TILESIZE) * 3
         self.rect.center = (center.x, center.y)
 
-    def possible_moves(self, grid):
-        pass
-
-    def get_offsets(self, size, offset):
-        off = {'up': -1, 'down': size, 'left': -1, 'right': size}
-        if offset:
-            off = offset
-            off = {
-                'up': max(-1, self.row - off.up - 1),
-                'down': min(8, self.row + off.down + 1),
-                'left': max(-1, self.col - off.left - 1),
-                'right': min(8, self.col + off.right + 1)
-            }
-        return Offsets(**off)
-
-    def diagonals(self, x, y, size, offset=None):
-        off = self.get_offsets(size, offset)
-        return [
-            zip(range(x - 1, off.up, -1), range(y - 1, off.left, -1)),
-            zip(range(x - 1, off.up, -1), range(y + 1, off.right, 1)),
-            zip(range(x + 1, off.down, 1), range(y + 1, off.right, 1)),
-            zip(range(x + 1, off.down, 1), range(y - 1, off.left, -1))
-        ]
-
-    def verticals(self, x, y, size, offset=None):
-        off = self.get_offsets(size, offset)
-
-        up = range(x - 1, off.up, -1)
-        down = range(x + 1, off.down, 1)
-        left = range(y - 1, off.left, -1)
-        right = range(y + 1, off.right, 1)
-
-        return [
-            zip(up, [y] * len(up)),
-            zip(down, [y] * len(down)),
-            zip([x] * len(left), left),
-            zip([x] * len(right), right)
-        ]
-
-    def clear_diagonals(self, grid, offset=None):
-        """ Get free diagonals within offset """
-        moves = []
-        for diag in self.diagonals(self.row, self.col, 8, offset):
-            for coords in diag:
-                if grid[coords]:
-                    piece = PieceId(*[int(e) for e in str(grid[coords])])
-                    if Color(piece.color) != self.color:
-                        moves.append(Coords(x=coords[1], y=coords[0]))
-                    break
-                else:
-                    moves.append(Coords(x=coords[1], y=coords[0]))
-        return moves
-
-    def clear_verticals(self, grid, offset=None, can_capture=True):
-        """ Get free verticals within offset """
-        moves = []
-        for vert in self.verticals(self.row, self.col, 8, offset):
-            for coords in vert:
-                if grid[coords]:
-                    piece = PieceId(*[int(e) for e in str(grid[coords])])
-                    if can_capture and Color(piece.color) != self.color:
-                        moves.append(Coords(x=coords[1], y=coords[0]))
-                    break
-                else:
-                    moves.append(Coords(x=coords[1], y=coords[0]))
-        return moves
+    @property
+    def square(self):
+        return self.pos.square
 
     @property
     def row(self):
@@ -151,109 +76,30 @@ class King(Piece):
         super().__init__(PieceType.king, pid, color, pos)
         self.moved = False
         self.is_checked = False
-        self.move_offset = Offsets(1, 1, 1, 1)
-
-    def possible_moves(self, grid):
-        return chain.from_iterable([
-            self.clear_diagonals(grid, self.move_offset),
-            self.clear_verticals(grid, self.move_offset)
-        ])
-
-    def castle_positions(self, grid):
-        # left castle
-        off_l = Offsets(up=0, down=0, left=2, right=0)
-        left_castle = self.clear_verticals(grid, off_l)
-
-        # right castle
-        off_r = Offsets(up=0, down=0, left=0, right=2)
-        right_castle = self.clear_verticals(grid, off_r)
-        return left_castle if len(left_castle) == 2 else [], \
-            right_castle if len(right_castle) == 2 else []
 
 
 class Queen(Piece):
     def __init__(self, pid, color, pos):
         super().__init__(PieceType.queen, pid, color, pos)
 
-    def possible_moves(self, grid):
-        return chain.from_iterable([
-            self.clear_diagonals(grid),
-            self.clear_verticals(grid)
-        ])
-
 
 class Rook(Piece):
     def __init__(self, pid, color, pos):
         super().__init__(PieceType.rook, pid, color, pos)
         self.moved = False
 
-    def possible_moves(self, grid):
-        return self.clear_verticals(grid)
-
 
 class Knight(Piece):
     def __init__(self, pid, color, pos):
         super().__init__(PieceType.knight, pid, color, pos)
 
-    def possible_moves(self, grid):
-        moves = []
-        offset = np.array([[-2, -1], [-2, 1], [2, -1], [2, 1]])
-        idx = np.row_stack((offset, offset[:, ::-1])) + (self.row, self.col)
-        idxs = idx[~((idx < 0) | (idx > 7)).any(1)]
-        for coords in idxs:
-            coords = tuple(coords)
-            if grid[coords]:
-                piece = PieceId(*[int(e) for e in str(grid[coords])])
-                if Color(piece.color) != self.color:
-                    moves.append(Coords(x=coords[1], y=coords[0]))
-            else:
-                moves.append(Coords(x=coords[1], y=coords[0]))
-        return moves
-
 
 class Bishop(Piece):
     def __init__(self, pid, color, pos):
         super().__init__(PieceType.bishop, pid, color, pos)
 
-    def possible_moves(self, grid):
-        return self.clear_diagonals(grid)
-
 
 class Pawn(Piece):
     def __init__(self, pid, color, pos):
         super().__init__(PieceType.pawn, pid, color, pos)
         self.moved = False
-        self.move_offset = Offsets(
-            up=-1 if color == Color.black else 1,
-            down=-1 if color == Color.white else 1,
-            left=1,
-            right=1
-        )
-
-    def possible_moves(self, grid):
-        moves = []
-        for move in self.clear_diagonals(grid, self.move_offset):
-            # only move diagonally if there's an enemy piece.
-            # due to logic in clear_diagonals there can only
-            # be enemy pieces
-            if grid[move.row, move.col]:
-                moves.append(move)
-
-        for move in self.clear_verticals(grid, offset=self.move_offset, can_capture=False):
-            # only allow y-axis movement
-            if move.col == self.col:
-                moves.append(move)
-
-        if not self.moved:
-            # if pawn hasn't moved yet, then it gets a POWA MOVE
-            # if no one is there
-            powa_move = Coords(
-                x=self.col,
-                y=self.row + 2 if self.color == Color.black else self.row - 2
-            )
-            if powa_move.row < 0 or powa_move.row > 7:
-                pass
-            elif not grid[powa_move.row, powa_move.col]:
-                moves.append(powa_move)
-
-        return moves
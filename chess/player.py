@@ -1,7 +1,12 @@
 import logging
-from random import choice
 from pathlib import Path
 
+from chess.utils.coords import Coords
+from chess.engine.encoding import QUEEN
+from chess.engine.pieces import PieceType
+from chess.engine.players import RandomPlayer, SearchPlayer, MCTSPlayer
+from chess.engine.background import BackgroundPlayer, InlinePlayer
+
 
 logger = logging.getLogger(Path(__file__).stem)
 
@@ -11,7 +16,9 @@ class PlayerFactory:
     def make(name):
         return {
             'human': HumanPlayer,
-            'random AI': RandomAI
+            'random AI': RandomAI,
+            'search AI': SearchAI,
+            'mcts AI': MCTSAI
         }[name]
 
 
@@ -27,6 +34,9 @@ class Player:
     def promote(self, board, pawn, promotion_selector=None, pos=None):
         pass
 
+    def close(self):
+        pass
+
 
 class HumanPlayer(Player):
     type = 'human'
@@ -56,18 +66,80 @@ class HumanPlayer(Player):
         return pick
 
 
-class RandomAI(Player):
+class EngineAI(Player):
+    """ Plays the moves of a headless engine player on the board. The
+    engine thinks in a process of its own, see think """
     type = 'machine'
+    engine = None
+    # keyword arguments of engine
+    options = {}
+    # whether the engine thinks in a process of its own
+    background = True
 
     def __init__(self, color):
         super().__init__(color)
+        make = BackgroundPlayer if self.background else InlinePlayer
+        self.player = make(self.engine, **self.options)
+        # piece type the last move promotes to, 0 for none
+        self.promotion = 0
+        self.future = None
+        self.last_report = ''
+
+    def think(self, grid):
+        """ Starts choosing a move for the board's position in the
+        background. The future's result is the packed move and a report """
+        self.future = self.player.choose(grid.position)
+        return self.future
+
+    def play(self, grid, thought):
+        """ Plays what think came up with on the board """
+        self.future = None
+        move, self.last_report = thought
+        from_, to = Coords.from_square(move & 63), Coords.from_square(move >> 6 & 63)
+        self.promotion = move >> 12
+        grid.move(from_=from_, to=to)
+        return from_, to
+
+    def report(self):
+        return self.last_report
+
+    def ponder(self, grid):
+        """ Keeps the engine thinking while the rival picks a move """
+        self.player.ponder(grid.position)
 
     def move(self, grid, pos=None):
-        cho = choice(grid.get_possible_moves(grid.grid, self.color))
-        grid.move(from_=cho[0], to=cho[1])
-        return cho
+        move = self.play(grid, self.think(grid).result())
+        if self.last_report and grid.console is not None:
+            grid.console.log(self.last_report)
+        return move
+
+    def cancel(self):
+        """ Drops the move being thought, if any """
+        if self.future is not None and not self.future.cancel():
+            self.player.stop()
+        self.future = None
+
+    def close(self):
+        self.cancel()
+        self.player.close()
 
     def promote(self, board, pawn, promotion_selector=None, pos=None):
-        pick = choice(promotion_selector.promotions)
+        pick = PieceType(self.promotion or QUEEN).name
         board.handle_promotions(pawn, pick)
         return pick
+
+
+class RandomAI(EngineAI):
+    engine = RandomPlayer
+    # picking a move takes less than starting a process
+    background = False
+
+
+class SearchAI(EngineAI):
+    engine = SearchPlayer
+    options = {'ponder': True}
+
+
+class MCTSAI(EngineAI):
+    engine = MCTSPlayer
+    options = {'ponder': True}
@@ -4,6 +4,8 @@ from pathlib import PurePath
 # PYGAME OPTIONS
 FONT_PATH = str(PurePath('assets', 'fonts', 'redalert_inet.ttf'))
 SPRITE_FOLDER = str(PurePath('assets', 'sprites'))
+# finished games are saved here as PGN
+PGN_FOLDER = 'games'
 
 # define some colors (R, G, B)
 WHITE = (255, 255, 255)
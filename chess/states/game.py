@@ -1,7 +1,10 @@
+import time
 import logging
+from array import array
 from pathlib import Path
 from dataclasses import dataclass, field
 from typing import ClassVar, Union, Dict
+from concurrent.futures import Future
 
 import pygame as pg
 
@@ -9,11 +12,15 @@ import chess.settings as s
 from chess.states.state import State
 from chess.panels.game.wood import Wood
 from chess.panels.game.board import Board
+from chess.engine.game import GameStatus
 from chess.panels.game.promotion import Promotion
 from chess.panels.game.game_over import GameOver
 from chess.utils.coords import Coords
 from chess.player import Player, PlayerFactory
-from chess.pieces import Color
+from chess.engine.pieces import Color, PieceType
+from chess.engine.encoding import encode_move, move_list
+from chess.engine.fen import START_FEN
+from chess.engine.pgn import PgnGame, format_game, result_of
 from chess.panels.console import Console
 from chess.utils.typewriter import TypewriterConfig
 
@@ -40,6 +47,12 @@ class Game(State):
     moves: int = 0
     config: dict = field(default_factory=dict)
     last_call: int = 0
+    # move a machine player is thinking in the background
+    thinking: Union[None, Future] = None
+    thinking_since: float = 0.0
+    # packed moves played and the FEN they were played from, for PGN
+    record: array = field(default_factory=move_list)
+    start_fen: str = START_FEN
 
     def __post_init__(self):
         self.debug_draws = [
@@ -90,8 +103,16 @@ class Game(State):
             )
         )
         self.board.set_console(self.console)
+        self.shutdown()
+        self.config = config
+        self.is_game_over = False
         self.players = {k: PlayerFactory.make(name=v)(k) for k, v in config['player'].items()}
         self.turn = Color.white
+        self.thinking = None
+        self.record = move_list()
+        self.start_fen = config.get('fen', START_FEN)
+        if self.start_fen != START_FEN:
+            self.turn = self.board.load_fen(self.start_fen)
 
     def update(self, screen, current_time, dt):
         self.current_time = current_time / 1000
@@ -137,12 +158,16 @@ class Game(State):
                     grid_click_pos = event.pos
 
         if self.check_mate() or self.draw():
+            if not self.is_game_over:
+                self.save_pgn()
             self.is_game_over = True
             return  # no more mr nice guy
 
         # handle turn: move or promote
         is_machine = self.players[self.turn].type == 'machine'
-        if not self.is_promoting and (grid_click_pos or is_machine):
+        if not self.is_promoting and is_machine:
+            move = self.machine_move()
+        elif not self.is_promoting and grid_click_pos:
             mpos = self.board.px_to_grid(Coords(x=grid_click_pos[0], y=grid_click_pos[1])) \
                 if grid_click_pos is not None else None
             move = self.players[self.turn].move(
@@ -171,12 +196,50 @@ class Game(State):
         if not self.is_promoting and (move or prom):
             self.log_turn(prom)
             self.turn = Color.next(self.turn)
+            self.ponder()
+
+    def machine_move(self):
+        """ Starts the machine player thinking, polls it every frame after
+        that and plays its move once it's there """
+        player = self.players[self.turn]
+        if self.thinking is None:
+            self.thinking = player.think(self.board)
+            self.thinking_since = self.current_time
+            self.console.log(f'{self.turn.name} thinking')
+            return None
+        if not self.thinking.done():
+            self.show_thinking()
+            return None
+        move = player.play(self.board, self.thinking.result())
+        self.console.update_last(f'{self.turn.name} {player.report()}'.strip())
+        self.thinking = None
+        return move
+
+    def ponder(self):
+        """ Lets the machine that just moved think on a human's time """
+        player, rival = self.players[Color.next(self.turn)], self.players[self.turn]
+        if player.type == 'machine' and rival.type == 'human':
+            player.ponder(self.board)
+
+    def show_thinking(self):
+        dots = int((self.current_time - self.thinking_since) * 3) % 4
+        text = f'{self.turn.name} thinking{"." * dots}'
+        if self.console.history[-1][1] != text:
+            self.console.update_last(text)
+
+    def shutdown(self):
+        """ Stops machine players thinking and lets go of their workers """
+        for player in self.players.values():
+            player.close()
+        self.thinking = None
 
     def log_prom(self, prom):
         for _ in range(100):
             self.console.log(f'[DEBUG] {self.turn} has promoted a pawn to {prom}!')
 
     def log_turn(self, prom):
+        from_, to = self.last_move
+        self.record.append(encode_move(from_.square, to.square, PieceType[prom].value if prom else 0))
         self.moves += 1
         self.move.log(f'[{self.moves:03}]')
         msg = str(self.last_move)
@@ -188,11 +251,30 @@ class Game(State):
         self.move.log('')
 
     def check_mate(self):
-        king = self.board.get_king(self.turn)
-        return king.is_checked and not \
-            self.board.get_possible_moves(self.board.grid, self.turn)
+        return self.board.get_status(self.turn) == GameStatus.checkmate
 
     def draw(self):
-        king = self.board.get_king(self.turn)
-        return not king.is_checked and not \
-            self.board.get_possible_moves(self.board.grid, self.turn)
+        return self.board.get_status(self.turn) == GameStatus.stalemate
+
+    def pgn(self) -> PgnGame:
+        """ The game so far, with its result once it's over """
+        status = self.board.get_status(self.turn)
+        # the side to move is the one mated
+        game = PgnGame({
+            'Event': s.TITLE,
+            'Date': time.strftime('%Y.%m.%d'),
+            'White': self.config['player'][Color.white],
+            'Black': self.config['player'][Color.black],
+            'Result': result_of(status.name, Color.next(self.turn).value),
+        }, move_list(self.record))
+        if self.start_fen != START_FEN:
+            game.tags.update(SetUp='1', FEN=self.start_fen)
+        return game
+
+    def save_pgn(self):
+        """ Writes the finished game to the PGN folder """
+        folder = Path(s.PGN_FOLDER)
+        folder.mkdir(parents=True, exist_ok=True)
+        path = folder / f'{time.strftime("%Y%m%d-%H%M%S")}.pgn'
+        path.write_text(format_game(self.pgn()))
+        logger.info('Game saved to %s', path)
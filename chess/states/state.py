@@ -37,6 +37,11 @@ class State(metaclass=ABCMeta):
         self.persist = persistent
         self.start_time = current_time
 
+    def shutdown(self):
+        """ Called once when the program closes, to stop anything still
+        running in the background """
+        pass
+
     def cleanup(self):
         """Add variables that should persist to the self.persist dictionary.
         Then reset State.done to False."""
@@ -2,6 +2,16 @@ import pygame as pg
 
 
 class Coords(pg.math.Vector2):
+    @classmethod
+    def from_square(cls, sq: int) -> 'Coords':
+        """ Coords of a 0..63 engine square """
+        return cls(x=sq % 8, y=sq // 8)
+
+    @property
+    def square(self) -> int:
+        """ 0..63 engine square of these coords """
+        return int(self.y) * 8 + int(self.x)
+
     @property
     def row(self):
         return int(self.y)
@@ -0,0 +1,9 @@
+import pytest
+
+from chess.engine.perft import SUITE
+
+
+@pytest.fixture(params=SUITE, ids=lambda p: p.name)
+def perft_position(request):
+    """ Every position of the perft suite """
+    return request.param
@@ -0,0 +1,25 @@
+import pytest
+
+from chess.engine.book import OpeningBook, BookError, build, HEADER
+from chess.engine.pieces import new_grid
+from chess.engine.position import Position
+
+
+@pytest.fixture
+def book_path(tmp_path):
+    path = tmp_path / 'book.bin'
+    build([['e2e4', 'e7e5'], ['e2e4', 'c7c5'], ['d2d4']], path)
+    return path
+
+
+def test_moves(book_path):
+    with OpeningBook(book_path) as book:
+        assert sorted(weight for _, weight in book.moves(Position.from_grid(new_grid()))) == [1, 2]
+
+
+@pytest.mark.parametrize('size', [0, HEADER.size - 1, HEADER.size + 3])
+def test_short_file(book_path, size):
+    data = book_path.read_bytes()
+    book_path.write_bytes(data[:size])
+    with pytest.raises(BookError):
+        OpeningBook(book_path)
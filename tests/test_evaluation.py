@@ -0,0 +1,46 @@
+from random import Random
+
+from chess.engine.evaluation import full_score, check_score
+from chess.engine.perft import POSITIONS
+
+LINES = 40
+PLIES = 60
+
+
+def kept_score(position):
+    return position.middlegame, position.endgame, position.phase
+
+
+def test_incremental_score():
+    rng = Random(7)
+    seen = {'capture': 0, 'castle': 0, 'promotion': 0}
+    for i in range(LINES):
+        # both have castling rights and pawns a push away from promoting
+        position = POSITIONS['kiwipete' if i % 2 else 'promotions'].position()
+        scores = [kept_score(position)]
+        for _ in range(PLIES):
+            moves = position.legal_moves()
+            if not moves:
+                break
+            # lean towards the moves that change material and phase
+            special = [
+                m for m in moves if m >> 12 or position.squares[m >> 6 & 63]
+                or position.is_castle(m & 63, m >> 6 & 63)
+            ]
+            move = rng.choice(special if special and rng.random() < 0.5 else moves)
+            if move >> 12:
+                seen['promotion'] += 1
+            elif position.squares[move >> 6 & 63]:
+                seen['capture'] += 1
+            elif position.is_castle(move & 63, move >> 6 & 63):
+                seen['castle'] += 1
+            position.make(move)
+            check_score(position)
+            assert kept_score(position) == full_score(position)
+            scores.append(kept_score(position))
+        while position.stack:
+            position.unmake()
+            scores.pop()
+            check_score(position)
+            assert kept_score(position) == full_score(position) == scores[-1]
+    assert all(seen.values()), seen
@@ -0,0 +1,60 @@
+import json
+
+from chess.engine.encoding import move_name
+from chess.engine.fen import position_from_fen
+from chess.engine.game import game_status, GameStatus
+from chess.engine.mate import MateSearch, MateStatus, solve_batch
+
+# mate in 2, though Qh3 stalemates
+MATE_IN_TWO = '8/7Q/8/8/8/4K3/8/6k1 w - - 0 1'
+# mate in 5 reached by many move orders, so part of the tree is proved
+# out of the solved positions
+TRANSPOSING = '6Q1/8/3k4/8/2K5/8/8/8 w - - 0 1'
+# no mate in 1 or 2, and Qf2 stalemates at once
+STALEMATE_TRAP = '5Q2/7K/8/8/8/8/8/7k w - - 0 1'
+
+
+def solve(fen, mate_in):
+    return MateSearch().run(position_from_fen(fen), mate_in)
+
+
+def test_mate_in_two():
+    result = solve(MATE_IN_TWO, 2)
+    assert result.status == MateStatus.mate
+    assert len(result.line) == 3
+    assert replay(MATE_IN_TWO, result.line) == GameStatus.checkmate
+
+
+def replay(fen, line):
+    position = position_from_fen(fen)
+    for move in line:
+        assert move in position.legal_moves()
+        position.make(move)
+    return game_status(position)
+
+
+def test_line_through_transpositions():
+    result = solve(TRANSPOSING, 5)
+    assert result.status == MateStatus.mate
+    assert len(result.line) <= 9
+    assert replay(TRANSPOSING, result.line) == GameStatus.checkmate
+
+
+def test_not_in_one():
+    assert solve(MATE_IN_TWO, 1).status == MateStatus.no_mate
+
+
+def test_stalemate_is_no_mate():
+    for mate_in in (1, 2):
+        assert solve(STALEMATE_TRAP, mate_in).status == MateStatus.no_mate
+
+
+def test_batch_in_order():
+    puzzles = [
+        json.dumps({'id': i, 'fen': fen, 'mate_in': mate_in})
+        for i, (fen, mate_in) in enumerate([(MATE_IN_TWO, 2), (STALEMATE_TRAP, 1), (MATE_IN_TWO, 1)] * 7)
+    ]
+    results = list(solve_batch(puzzles, workers=2))
+    assert [result['id'] for result in results] == list(range(len(puzzles)))
+    assert [result['status'] for result in results[:3]] == ['mate', 'no_mate', 'no_mate']
+    assert results[0]['line'][-1] == move_name(solve(MATE_IN_TWO, 2).line[-1])
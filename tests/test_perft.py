@@ -0,0 +1,22 @@
+import pytest
+
+from chess.engine.perft import POSITIONS, run, verify
+
+# deeper counts take too long for every run
+MAX_DEPTH = 3
+
+
+@pytest.mark.parametrize('depth', range(1, MAX_DEPTH + 1))
+def test_counts(perft_position, depth):
+    if depth > len(perft_position.expected):
+        pytest.skip('no expected count')
+    result = run(perft_position, depth)
+    assert result.nodes == perft_position.expected[depth - 1]
+
+
+def test_start_counts():
+    assert [run(POSITIONS['start'], depth).nodes for depth in (1, 2, 3)] == [20, 400, 8982]
+
+
+def test_verify():
+    assert all(result.ok for result in verify(max_depth=2))
@@ -0,0 +1,128 @@
+import io
+from random import Random
+
+import pytest
+
+from chess.engine.encoding import parse_move
+from chess.engine.fen import START_FEN, FenError, parse_fen, position_from_fen, fen_of
+from chess.engine.game import game_status, GameStatus
+from chess.engine.pgn import PgnGame, PgnError, san, parse_san, read_games, format_game, write_games
+
+
+@pytest.mark.parametrize('fen', [
+    START_FEN,
+    'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R b KQkq - 3 17',
+    '8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1',
+])
+def test_fen_round_trip(fen):
+    fields = parse_fen(fen)
+    assert fen_of(position_from_fen(fen), fields.halfmove, fields.fullmove) == fen
+
+
+def test_castling_needs_king_and_rook_home():
+    position = position_from_fen('4k3/8/8/8/8/8/8/4K3 w K - 0 1')
+    assert position.castling == 0
+    for move in position.legal_moves():
+        position.make(move)
+        position.unmake()
+    assert fen_of(position_from_fen('r3k3/8/8/8/8/8/8/4K2R w KQkq - 0 1')).split()[2] == 'Kq'
+
+
+@pytest.mark.parametrize('fen', [
+    '', '8/8/8 w - - 0 1', 'rnbqkbnr/ppppppxp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1',
+    START_FEN.replace(' w ', ' x '), START_FEN.replace('KQkq', 'KQz'),
+])
+def test_bad_fen(fen):
+    with pytest.raises(FenError):
+        parse_fen(fen)
+
+
+def san_of(fen, name):
+    position = position_from_fen(fen)
+    return san(position, parse_move(name))
+
+
+@pytest.mark.parametrize('fen, name, text', [
+    (START_FEN, 'g1f3', 'Nf3'),
+    (START_FEN, 'e2e4', 'e4'),
+    ('r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1', 'e1g1', 'O-O'),
+    ('r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1', 'e1c1', 'O-O-O'),
+    ('r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1', 'a1a8', 'Rxa8+'),
+    ('7k/P7/8/8/8/8/8/K7 w - - 0 1', 'a7a8q', 'a8=Q+'),
+    ('7k/8/6K1/8/8/8/8/R7 w - - 0 1', 'a1a8', 'Ra8#'),
+    # knights on b1 and f1 both go to d2, rooks on a1 and a5 both to a3
+    ('4k3/8/8/R7/8/8/8/RN2KN2 w - - 0 1', 'b1d2', 'Nbd2'),
+    ('4k3/8/8/R7/8/8/8/RN2KN2 w - - 0 1', 'a5a3', 'R5a3'),
+    # a double push jumps the pawn in front, so both pawns push to e4
+    ('4k3/8/8/8/8/4P3/4P3/4K3 w - - 0 1', 'e2e4', 'e2e4'),
+    ('4k3/8/8/8/8/4P3/4P3/4K3 w - - 0 1', 'e3e4', 'e3e4'),
+])
+def test_san(fen, name, text):
+    assert san_of(fen, name) == text
+    assert parse_san(position_from_fen(fen), text) == parse_move(name)
+
+
+def test_parse_san():
+    position = position_from_fen(START_FEN)
+    assert parse_san(position, 'Nf3!?') == parse_move('g1f3')
+    assert parse_san(position, 'g1f3') == parse_move('g1f3')
+    with pytest.raises(PgnError):
+        parse_san(position, 'e5')
+    with pytest.raises(PgnError):
+        parse_san(position_from_fen('4k3/8/8/8/8/4P3/4P3/4K3 w - - 0 1'), 'e4')
+
+
+OPERA = '''[Event "Paris"]
+[White "Morphy"]
+[Black "Duke Karl / Count Isouard"]
+[Result "1-0"]
+
+1.e4 e5 2.Nf3 d6 3.d4 Bg4 {a weak move} 4.dxe5 Bxf3 5.Qxf3 dxe5 6.Bc4 Nf6 7.Qb3
+Qe7 8.Nc3 c6 9.Bg5 b5 10.Nxb5 cxb5 11.Bxb5+ Nbd7 12.O-O-O Rd8 13.Rxd7 Rxd7
+14.Rd1 Qe6 (14...Qb4 15.Qxb4) 15.Bxd7+ Nxd7 16.Qb8+ $1 Nxb8 17.Rd8# 1-0
+'''
+
+
+def test_read_and_format():
+    game, = read_games(io.StringIO(OPERA))
+    assert len(game.moves) == 33 and game.result == '1-0'
+    final = game.final_position()
+    assert game_status(final) == GameStatus.checkmate
+    again, = read_games(io.StringIO(format_game(game)))
+    assert again.moves == game.moves and again.tags['Black'] == game.tags['Black']
+
+
+def test_round_trip_random_games():
+    rng = Random(5)
+    games = []
+    for i in range(20):
+        position = position_from_fen(START_FEN)
+        game = PgnGame({'Round': str(i + 1)})
+        for _ in range(120):
+            moves = position.legal_moves()
+            if not moves:
+                break
+            game.moves.append(rng.choice(moves))
+            position.make(game.moves[-1])
+        games.append(game)
+    text = io.StringIO()
+    assert write_games(games, text) == len(games)
+    text.seek(0)
+    assert [game.moves for game in read_games(text)] == [game.moves for game in games]
+
+
+def test_skip_errors():
+    bad_fen = '[FEN "8/8/8 w - - 0 1"]\n\n1. e4 *\n\n'
+    illegal = '[Event "x"]\n\n1. e5 *\n\n'
+    text = bad_fen + illegal + OPERA
+    with pytest.raises(PgnError):
+        list(read_games(io.StringIO(text)))
+    games = list(read_games(io.StringIO(text), skip_errors=True))
+    assert [len(game.moves) for game in games] == [33]
+
+
+def test_set_up_position():
+    fen = '7k/8/6K1/8/8/8/8/R7 w - - 0 1'
+    game, = read_games(io.StringIO(f'[SetUp "1"]\n[FEN "{fen}"]\n\n1. Ra8# 1-0\n'))
+    assert game.fen == fen and len(game.moves) == 1
+    assert '[FEN "7k/8/6K1/8/8/8/8/R7 w - - 0 1"]' in format_game(game)
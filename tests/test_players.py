@@ -0,0 +1,49 @@
+from chess.engine.fen import START_FEN, position_from_fen
+from chess.engine.players import MCTSPlayer, PONDER_PLAYOUTS
+
+
+def walk(node):
+    yield node
+    for child in node.children:
+        yield from walk(child)
+
+
+def assert_counted(root):
+    """ Every playout through a node went through its parent too """
+    for node in walk(root):
+        assert sum(child.visits for child in node.children) <= node.visits
+
+
+def pondering_player(position):
+    player = MCTSPlayer(playouts=300, seconds=None, seed=1, ponder=True)
+    position.make(player.choose(position))
+    reply = player.predict(position)
+    player.ponder(position)
+    player.running.join()
+    return player, reply
+
+
+def test_ponder_limits():
+    assert MCTSPlayer().ponder_limits().playouts == PONDER_PLAYOUTS
+    assert MCTSPlayer(playouts=100).ponder_limits().playouts == 100
+
+
+def test_ponder_miss_keeps_the_tree_whole():
+    position = position_from_fen(START_FEN)
+    player, reply = pondering_player(position)
+    # what choose does when the rival plays something else
+    player.drop(player.running)
+    player.running = None
+    assert player.search.root is player.before_ponder
+    assert_counted(player.search.root)
+    player.close()
+
+
+def test_ponder_hit_cuts_the_old_tree():
+    position = position_from_fen(START_FEN)
+    player, reply = pondering_player(position)
+    position.make(reply)
+    player.choose(position)
+    assert player.last_hit
+    assert player.before_ponder.find(position.hash).parent is None
+    player.close()
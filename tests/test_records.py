@@ -0,0 +1,100 @@
+from random import Random
+
+import pytest
+
+from chess.engine.fen import START_FEN, position_from_fen
+from chess.engine.encoding import move_list
+from chess.engine.records import (
+    GameRecord, GameRecords, RecordWriter, RecordError, HEADER, append_games, export_pgn,
+    import_pgn, index_path, pack, reindex, unpack
+)
+
+SET_UP = '7k/8/6K1/8/8/8/8/R7 w - - 0 1'
+
+
+def random_record(rng, fen=START_FEN, plies=80):
+    position = position_from_fen(fen)
+    moves = move_list()
+    for _ in range(plies):
+        legal = position.legal_moves()
+        if not legal:
+            break
+        moves.append(rng.choice(legal))
+        position.make(moves[-1])
+    return GameRecord(moves, rng.choice(['1-0', '0-1', '1/2-1/2', '*']), fen)
+
+
+@pytest.fixture
+def records(tmp_path):
+    rng = Random(2)
+    games = [random_record(rng, SET_UP if i % 5 == 4 else START_FEN) for i in range(20)]
+    path = tmp_path / 'games.rec'
+    assert append_games(path, games) == len(games)
+    return path, games
+
+
+@pytest.mark.parametrize('fen', [START_FEN, SET_UP])
+def test_pack(fen):
+    record = random_record(Random(1), fen)
+    data = b'\0' * 5 + pack(record)
+    assert unpack(data, 5) == record
+
+
+def test_start_fen_is_left_out():
+    assert len(pack(GameRecord(move_list([1, 2])))) < len(pack(GameRecord(move_list([1, 2]), fen=SET_UP)))
+
+
+def test_random_access(records):
+    path, games = records
+    with GameRecords(path) as opened:
+        assert len(opened) == len(games)
+        for k in (7, 0, 19, 4, -1):
+            assert opened[k] == games[k]
+        with pytest.raises(IndexError):
+            opened[len(games)]
+        assert list(opened) == games
+
+
+def test_torn_index_entry(records):
+    path, games = records
+    with open(index_path(path), 'ab') as index:
+        index.write(b'\1\2\3')
+    with GameRecords(path) as opened:
+        assert len(opened) == len(games)
+        assert opened[-1] == games[-1]
+
+
+def test_reindex_cuts_trailing_bytes(records):
+    path, games = records
+    size = path.stat().st_size
+    # a writer that died halfway through a game, and lost the index
+    with open(path, 'ab') as f:
+        f.write(pack(games[0])[:7])
+    index_path(path).unlink()
+    assert reindex(path) == len(games)
+    assert path.stat().st_size == size
+    with GameRecords(path) as opened:
+        assert list(opened) == games
+    # and appending goes on from there
+    with RecordWriter(path) as writer:
+        writer.append(games[3])
+    with GameRecords(path) as opened:
+        assert opened[-1] == games[3] and len(opened) == len(games) + 1
+
+
+def test_not_records(tmp_path):
+    path = tmp_path / 'empty.rec'
+    path.write_bytes(b'')
+    with pytest.raises(RecordError):
+        GameRecords(path)
+    path.write_bytes(b'nope' + bytes(HEADER.size))
+    with pytest.raises(RecordError):
+        GameRecords(path)
+
+
+def test_pgn_round_trip(records, tmp_path):
+    path, games = records
+    assert export_pgn(path, tmp_path / 'games.pgn') == len(games)
+    assert import_pgn(tmp_path / 'games.pgn', tmp_path / 'again.rec') == len(games)
+    with GameRecords(tmp_path / 'again.rec') as opened:
+        assert list(opened) == games
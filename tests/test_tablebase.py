@@ -0,0 +1,50 @@
+from random import Random
+
+import pytest
+
+from chess.engine.tablebase import (
+    Tablebases, generate, summary, squares_of_index, parse_material, loss, DRAW, _setup
+)
+
+SAMPLES = 2000
+
+
+@pytest.fixture(scope='module')
+def kqvk(tmp_path_factory):
+    """ Directory with KQvK and KvK, built once for the module """
+    directory = tmp_path_factory.mktemp('tablebases')
+    generate('KQvK', directory)
+    return directory
+
+
+def test_longest_mate(kqvk):
+    wins, draws, losses, longest = summary(kqvk / 'KQvK.tb')
+    # mate in 10 at most: 20 plies with the lone king to move
+    assert longest == 20
+    assert wins and draws and losses
+
+
+def test_consistent(kqvk):
+    """ Every stored value is the best one a move leads to """
+    codes = parse_material('KQvK')
+    rng = Random(3)
+    checked = 0
+    with_moves = 0
+    tablebases = Tablebases(kqvk)
+    try:
+        while checked < SAMPLES:
+            squares, turn = squares_of_index(rng.randrange(2 * 64 ** len(codes)), len(codes))
+            position = _setup(codes, squares, turn)
+            if position is None:
+                continue
+            value = tablebases.probe(position)
+            best = tablebases.best_move(position)
+            if best is None:
+                assert value == (loss(0) if position.check else DRAW)
+            else:
+                assert value == best.value
+                with_moves += 1
+            checked += 1
+    finally:
+        tablebases.close()
+    assert with_moves
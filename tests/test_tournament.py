@@ -0,0 +1,18 @@
+import math
+
+from chess.engine.tournament import Score, elo_difference, table
+
+
+def test_no_games():
+    assert elo_difference(Score()) is None
+    assert 'random AI' in table(('random AI', 'search AI'), Score())
+
+
+def test_perfect_score_has_no_bounds():
+    elo, low, high = elo_difference(Score(wins=10))
+    assert elo == math.inf and low is None and high is None
+
+
+def test_even_score():
+    elo, low, high = elo_difference(Score(wins=30, draws=40, losses=30))
+    assert elo == 0 and low < 0 < high